@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""接口地址的读取 (/proc/net/if_inet6, rtnetlink, netifaces 或脚本时间线) 和待发布地址的选择"""
+
+import hashlib
+import ipaddress
+import json
+import logging
+import os
+import socket
+import struct
+import time
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from netlink import (IFA_ADDRESS, IFA_CACHEINFO, IFA_CACHEINFO_STRUCT, IFA_F_DADFAILED, IFA_F_DEPRECATED,
+                     IFA_F_MANAGETEMPADDR, IFA_F_PERMANENT, IFA_F_SECONDARY, IFA_F_TEMPORARY, IFA_F_TENTATIVE,
+                     IFA_FLAGS, IFA_LOCAL, IFADDRMSG, NLM_F_DUMP, NLM_F_REQUEST, NLMSG_DONE, NLMSG_ERROR,
+                     NLMSG_HEADER, RTM_GETADDR, RTM_NEWADDR, iter_netlink_messages, parse_rtattrs)
+
+# 内核导出的接口 IPv6 地址表
+PROC_IF_INET6 = '/proc/net/if_inet6'
+# 可发布到公网 DNS 的 IPv6 全球单播地址段, 以及其中需要排除的过渡/废弃地址段
+IPV6_GLOBAL_UNICAST = ipaddress.IPv6Network('2000::/3')
+IPV6_EXCLUDED_NETWORKS = (ipaddress.IPv6Network('2002::/16'), ipaddress.IPv6Network('3ffe::/16'))
+IPV6_UNIQUE_LOCAL = ipaddress.IPv6Network('fc00::/7')
+# 地址选择策略: stable 优先稳定地址, temporary 优先隐私(临时)地址, any 不区分
+ADDRESS_POLICIES = ('stable', 'temporary', 'any')
+# 可选的接口地址来源, auto 按平台和所需的地址族选择
+ADDRESS_SOURCES = ('auto', 'proc', 'netlink', 'netifaces', 'scripted')
+DEFAULT_ADDRESS_POLICY = 'stable'
+
+
+class InterfaceAddress(NamedTuple):
+    """接口上的一个地址及其内核属性, 生命周期未知时为 None"""
+    address: str
+    prefixlen: int
+    scope: int
+    flags: int
+    preferred_lft: Optional[int] = None
+    valid_lft: Optional[int] = None
+
+
+def select_ipv6_address(addresses: List[InterfaceAddress], policy: str = DEFAULT_ADDRESS_POLICY,
+                        allow_private: bool = False) -> Optional[str]:
+    """从接口地址中选出要发布的 IPv6 地址
+
+    只考虑全球单播地址 (allow_private 时也接受 ULA), 排除未完成或失败 DAD 的地址.
+    排序依次为: 未过期优先, 符合策略的临时/稳定属性优先; 稳定地址中手工配置的优先于
+    SLAAC 基础地址 (mngtmpaddr), 临时地址取剩余首选生命周期最长的; 最后按地址数值排序,
+    保证同样的地址集合总是选出同一个地址.
+    """
+    candidates = []
+    for addr in addresses:
+        try:
+            ip = ipaddress.IPv6Address(addr.address.split('%')[0])
+        except ValueError:
+            continue
+        if addr.flags & (IFA_F_TENTATIVE | IFA_F_DADFAILED):
+            continue
+        if ip in IPV6_GLOBAL_UNICAST and ip.is_global:
+            if any(ip in network for network in IPV6_EXCLUDED_NETWORKS):
+                continue
+        elif not (allow_private and ip in IPV6_UNIQUE_LOCAL):
+            continue
+
+        deprecated = bool(addr.flags & IFA_F_DEPRECATED) or addr.preferred_lft == 0
+        temporary = bool(addr.flags & IFA_F_TEMPORARY)
+        if policy == 'stable':
+            mismatch = temporary
+        elif policy == 'temporary':
+            mismatch = not temporary
+        else:
+            mismatch = False
+        if temporary:
+            # 临时地址轮换时新地址的剩余首选生命周期最长
+            preference = -(addr.preferred_lft or 0) if policy == 'temporary' else 0
+        elif addr.flags & IFA_F_PERMANENT:
+            preference = 0
+        else:
+            preference = 1 if addr.flags & IFA_F_MANAGETEMPADDR else 2
+        candidates.append(((deprecated, mismatch, preference, int(ip)), str(ip)))
+
+    if not candidates:
+        return None
+    return min(candidates)[1]
+
+
+def select_ipv4_address(addresses: List[InterfaceAddress], policy: str = DEFAULT_ADDRESS_POLICY,
+                        allow_private: bool = False) -> Optional[str]:
+    """从接口地址中选出要发布的 IPv4 地址, 主地址优先, 其余按地址数值排序; policy 对 IPv4 无意义"""
+    candidates = []
+    for addr in addresses:
+        try:
+            ip = ipaddress.IPv4Address(addr.address)
+        except ValueError:
+            continue
+        if not ip.is_global and not (allow_private and ip.is_private and not ip.is_loopback
+                                     and not ip.is_link_local):
+            continue
+        candidates.append(((bool(addr.flags & IFA_F_SECONDARY), int(ip)), str(ip)))
+
+    if not candidates:
+        return None
+    return min(candidates)[1]
+
+
+# 记录类型 -> (地址族名称, 地址选择函数); 同一次接口扫描的结果供所有记录类型共用
+ADDRESS_SELECTORS: Dict[str, Tuple[str, Callable[..., Optional[str]]]] = {
+    'A': ('IPv4', select_ipv4_address),
+    'AAAA': ('IPv6', select_ipv6_address),
+}
+
+
+class AddressProvider:
+    """接口地址来源的基类: 每轮同步开始时调用一次 refresh(), 之后按接口名查询地址"""
+
+    def refresh(self) -> bool:
+        """重新读取地址, 返回地址是否可能发生了变化"""
+        return True
+
+    def addresses(self, interface: str) -> Optional[List[InterfaceAddress]]:
+        """返回接口的地址列表, 接口不存在时返回 None"""
+        raise NotImplementedError
+
+
+class NetifacesProvider(AddressProvider):
+    """通过 netifaces 读取接口的 IPv4/IPv6 地址, 每轮同步内每个接口只读取一次"""
+
+    def __init__(self):
+        import netifaces
+        self._netifaces = netifaces
+        self.cache: Dict[str, Optional[List[InterfaceAddress]]] = {}
+
+    def refresh(self) -> bool:
+        self.cache = {}
+        return True
+
+    def addresses(self, interface: str) -> Optional[List[InterfaceAddress]]:
+        """返回接口的地址列表, 接口不存在时返回 None"""
+        if interface not in self.cache:
+            if interface not in self._netifaces.interfaces():
+                self.cache[interface] = None
+            else:
+                addrs = self._netifaces.ifaddresses(interface)
+                self.cache[interface] = [
+                    InterfaceAddress(addr['addr'],
+                                     ipaddress.IPv4Network(f'0.0.0.0/{addr.get("netmask", "32")}').prefixlen, 0, 0)
+                    for addr in addrs.get(self._netifaces.AF_INET, [])
+                ] + [
+                    InterfaceAddress(addr['addr'].split('%')[0],  # 去除接口ID
+                                     int(addr.get('netmask', '/128').rpartition('/')[2] or 128), 0, 0)
+                    for addr in addrs.get(self._netifaces.AF_INET6, [])
+                ]
+        return self.cache[interface]
+
+
+class ProcInet6Provider(AddressProvider):
+    """从 /proc/net/if_inet6 一次性读取所有接口的 IPv6 地址, 内容未变化时跳过解析; 不提供 IPv4 地址"""
+
+    def __init__(self, path: str = PROC_IF_INET6):
+        self.path = path
+        self.digest: Optional[bytes] = None
+        self.index: Dict[str, List[InterfaceAddress]] = {}
+
+    def refresh(self) -> bool:
+        """重新读取地址表, 返回内容是否发生变化"""
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        digest = hashlib.sha1(data).digest()
+        if digest == self.digest:
+            return False
+
+        index: Dict[str, List[InterfaceAddress]] = {}
+        # 每行: 地址 接口序号 前缀长度 作用域 标志 接口名, 均为十六进制
+        for line in data.decode('ascii').splitlines():
+            fields = line.split()
+            if len(fields) != 6:
+                continue
+            address = socket.inet_ntop(socket.AF_INET6, bytes.fromhex(fields[0]))
+            index.setdefault(fields[5], []).append(
+                InterfaceAddress(address, int(fields[2], 16), int(fields[3], 16), int(fields[4], 16)))
+        self.index = index
+        self.digest = digest
+        return True
+
+    def addresses(self, interface: str) -> Optional[List[InterfaceAddress]]:
+        if interface in self.index:
+            return self.index[interface]
+        # 没有 IPv6 地址的接口不会出现在地址表中
+        try:
+            socket.if_nametoindex(interface)
+        except OSError:
+            return None
+        return []
+
+
+class NetlinkAddressProvider(AddressProvider):
+    """通过 rtnetlink 一次导出全部 IPv4/IPv6 地址, 可获得完整的 32 位标志和首选/有效生命周期"""
+
+    def __init__(self):
+        self.index: Dict[str, List[InterfaceAddress]] = {}
+        self.seq = 0
+
+    def dump(self) -> List[bytes]:
+        self.seq += 1
+        with socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE) as sock:
+            request = IFADDRMSG.pack(socket.AF_UNSPEC, 0, 0, 0, 0)
+            sock.send(NLMSG_HEADER.pack(NLMSG_HEADER.size + len(request), RTM_GETADDR,
+                                        NLM_F_REQUEST | NLM_F_DUMP, self.seq, 0) + request)
+            messages = []
+            while True:
+                for msg_type, payload in iter_netlink_messages(sock.recv(65536)):
+                    if msg_type == NLMSG_DONE:
+                        return messages
+                    if msg_type == NLMSG_ERROR:
+                        raise OSError(f'netlink 请求失败: {struct.unpack_from("=i", payload)[0]}')
+                    if msg_type == RTM_NEWADDR:
+                        messages.append(payload)
+
+    def refresh(self) -> bool:
+        index: Dict[str, List[InterfaceAddress]] = {}
+        names: Dict[int, Optional[str]] = {}
+        for payload in self.dump():
+            family, prefixlen, flags, scope, if_index = IFADDRMSG.unpack_from(payload)
+            attrs = parse_rtattrs(payload[IFADDRMSG.size:])
+            # 点对点接口上 IFA_ADDRESS 是对端地址, 本端地址在 IFA_LOCAL 中
+            raw_address = attrs.get(IFA_LOCAL, attrs.get(IFA_ADDRESS))
+            if family not in (socket.AF_INET, socket.AF_INET6) or raw_address is None:
+                continue
+            if if_index not in names:
+                try:
+                    names[if_index] = socket.if_indextoname(if_index)
+                except OSError:
+                    names[if_index] = None
+            if names[if_index] is None:
+                continue
+
+            # IFA_FLAGS 携带完整的 32 位标志, ifaddrmsg 中只有低 8 位
+            if IFA_FLAGS in attrs:
+                flags = struct.unpack('=I', attrs[IFA_FLAGS][:4])[0]
+            preferred_lft = valid_lft = None
+            if IFA_CACHEINFO in attrs:
+                preferred_lft, valid_lft, _, _ = IFA_CACHEINFO_STRUCT.unpack_from(attrs[IFA_CACHEINFO])
+            address = socket.inet_ntop(family, raw_address[:16 if family == socket.AF_INET6 else 4])
+            index.setdefault(names[if_index], []).append(
+                InterfaceAddress(address, prefixlen, scope, flags, preferred_lft, valid_lft))
+        self.index = index
+        return True
+
+    def addresses(self, interface: str) -> Optional[List[InterfaceAddress]]:
+        if interface in self.index:
+            return self.index[interface]
+        try:
+            socket.if_nametoindex(interface)
+        except OSError:
+            return None
+        return []
+
+
+class ScriptedAddressProvider(AddressProvider):
+    """按脚本时间线返回地址的假地址来源, 用于确定性的压测和回放, 不依赖本机网卡
+
+    时间线中的每个事件为 (时间, 接口名, 地址列表), 时间是相对于创建时 clock() 的秒数, 地址可以带
+    前缀长度 (如 2408:8000::1/64), 均视为永久地址. 接口在第一次出现之前视为不存在.
+    """
+
+    def __init__(self, events: Iterable[Tuple[float, str, List[str]]], clock: Callable[[], float] = time.time):
+        self.events = sorted(events, key=lambda event: event[0])
+        self.clock = clock
+        self.started = clock()
+        self.index: Dict[str, List[InterfaceAddress]] = {}
+
+    @classmethod
+    def load(cls, path: str, clock: Callable[[], float] = time.time) -> 'ScriptedAddressProvider':
+        """从 JSON 文件加载时间线: {"events": [{"at": 0, "interface": "eth0", "addresses": [...]}, ...]}"""
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(((event['at'], event['interface'], event['addresses']) for event in data['events']), clock)
+
+    def refresh(self) -> bool:
+        elapsed = self.clock() - self.started
+        index: Dict[str, List[InterfaceAddress]] = {}
+        for at, interface, addresses in self.events:
+            if at > elapsed:
+                break
+            index[interface] = [
+                InterfaceAddress(address.partition('/')[0], int(address.partition('/')[2] or 64), 0, IFA_F_PERMANENT)
+                for address in addresses
+            ]
+        changed = index != self.index
+        self.index = index
+        return changed
+
+    def addresses(self, interface: str) -> Optional[List[InterfaceAddress]]:
+        return self.index.get(interface)
+
+
+def create_address_provider(source: str = 'auto', need_ipv4: bool = False,
+                            script: Optional[str] = None) -> AddressProvider:
+    """按配置选择地址来源; auto 时只需要 IPv6 则优先 /proc/net/if_inet6, 需要 IPv4 则优先 netlink"""
+    if source == 'scripted':
+        if not script:
+            raise ValueError('地址来源 scripted 需要设置 address_script')
+        return ScriptedAddressProvider.load(script)
+    if source == 'auto':
+        if need_ipv4:
+            source = 'netlink' if hasattr(socket, 'AF_NETLINK') else 'netifaces'
+        else:
+            source = 'proc' if os.path.exists(PROC_IF_INET6) else 'netifaces'
+    if source == 'netlink':
+        return NetlinkAddressProvider()
+    if source == 'proc':
+        if need_ipv4:
+            logging.getLogger('DDNSLogger').warning('地址来源 proc 只提供 IPv6 地址, A 记录将无法更新')
+        return ProcInet6Provider()
+    if source == 'netifaces':
+        return NetifacesProvider()
+    raise ValueError(f'未知的地址来源: {source}, 可选 {" / ".join(ADDRESS_SOURCES)}')
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""阿里云 DNS (Alidns) RPC 接口的签名与异步客户端, 不依赖 aliyunsdkcore"""
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, Optional
+from urllib.parse import quote
+
+ALIDNS_ENDPOINT = 'https://alidns.aliyuncs.com/'
+ALIDNS_API_VERSION = '2015-01-09'
+
+
+class AlidnsError(Exception):
+    """Alidns 接口返回的错误"""
+
+    def __init__(self, code: str, message: str, status: int = 0, request_id: Optional[str] = None):
+        super().__init__(f'{code}: {message}')
+        self.code = code
+        self.message = message
+        self.status = status
+        self.request_id = request_id
+
+
+def percent_encode(value: str) -> str:
+    """按 RFC 3986 编码, 仅保留非保留字符 (A-Z a-z 0-9 - _ . ~)"""
+    return quote(str(value), safe='~')
+
+
+def compose_string_to_sign(params: Dict[str, str], method: str = 'GET') -> str:
+    """按参数名排序规范化后拼接待签名字符串"""
+    canonicalized = '&'.join(f'{percent_encode(k)}={percent_encode(v)}' for k, v in sorted(params.items()))
+    return f'{method}&{percent_encode("/")}&{percent_encode(canonicalized)}'
+
+
+def compute_signature(params: Dict[str, str], access_key_secret: str, method: str = 'GET') -> str:
+    """计算 RPC 风格接口的 HMAC-SHA1 签名 (SignatureVersion 1.0)"""
+    string_to_sign = compose_string_to_sign(params, method)
+    digest = hmac.new(f'{access_key_secret}&'.encode('utf-8'), string_to_sign.encode('utf-8'), hashlib.sha1).digest()
+    return base64.b64encode(digest).decode('ascii')
+
+
+def sign_params(action: str, params: Dict[str, str], access_key_id: str, access_key_secret: str,
+                method: str = 'GET') -> Dict[str, str]:
+    """补全公共参数并签名, 返回可直接作为查询字符串发送的参数"""
+    signed = {
+        'Format': 'JSON',
+        'Version': ALIDNS_API_VERSION,
+        'AccessKeyId': access_key_id,
+        'SignatureMethod': 'HMAC-SHA1',
+        'SignatureVersion': '1.0',
+        'SignatureNonce': uuid.uuid4().hex,
+        'Timestamp': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'Action': action,
+    }
+    signed.update({k: str(v) for k, v in params.items()})
+    signed['Signature'] = compute_signature(signed, access_key_secret, method)
+    return signed
+
+
+def encode_query(params: Dict[str, str]) -> str:
+    """按签名时相同的规则编码查询字符串"""
+    return '&'.join(f'{percent_encode(k)}={percent_encode(v)}' for k, v in params.items())
+
+
+def parse_response(status: int, body: bytes) -> Dict:
+    """解析接口响应, 出错时抛出 AlidnsError"""
+    try:
+        data = json.loads(body)
+    except ValueError:
+        raise AlidnsError('InvalidResponse', body[:200].decode('utf-8', 'replace'), status)
+    if status >= 400:
+        raise AlidnsError(data.get('Code', 'Unknown'), data.get('Message', ''), status, data.get('RequestId'))
+    return data
+
+
+class AsyncAlidnsClient:
+    """基于 aiohttp 的 Alidns 客户端, 所有请求复用同一个 keep-alive 连接池"""
+
+    def __init__(self, access_key_id: str, access_key_secret: str, endpoint: str = ALIDNS_ENDPOINT,
+                 max_connections: int = 8, timeout: float = 10):
+        try:
+            import aiohttp
+        except ImportError:
+            raise RuntimeError('异步后端需要安装 aiohttp: pip install aiohttp')
+        self._aiohttp = aiohttp
+        self.access_key_id = access_key_id
+        self.access_key_secret = access_key_secret
+        self.endpoint = endpoint
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.session = None
+        # 累计新建和复用的连接数
+        self.connections_opened = 0
+        self.connections_reused = 0
+
+    def _get_session(self):
+        # 会话必须在事件循环内创建
+        if self.session is None or self.session.closed:
+            aiohttp = self._aiohttp
+            trace_config = aiohttp.TraceConfig()
+            trace_config.on_connection_create_end.append(self._on_connection_create)
+            trace_config.on_connection_reuseconn.append(self._on_connection_reuse)
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                trace_configs=[trace_config],
+            )
+        return self.session
+
+    async def _on_connection_create(self, session, context, params) -> None:
+        self.connections_opened += 1
+
+    async def _on_connection_reuse(self, session, context, params) -> None:
+        self.connections_reused += 1
+
+    def connection_stats(self) -> Dict[str, int]:
+        return {'opened': self.connections_opened, 'reused': self.connections_reused}
+
+    async def call(self, action: str, **params) -> Dict:
+        """发起一次 RPC 调用并返回解析后的 JSON"""
+        query = encode_query(sign_params(action, params, self.access_key_id, self.access_key_secret))
+        try:
+            async with self._get_session().get(f'{self.endpoint}?{query}') as response:
+                return parse_response(response.status, await response.read())
+        except (self._aiohttp.ClientError, asyncio.TimeoutError) as e:
+            # 统一为 AlidnsError, 便于调用方判断是否可以重试
+            raise AlidnsError('NetworkError', str(e) or type(e).__name__)
+
+    async def close(self) -> None:
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
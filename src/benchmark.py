@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""端到端压测: 用本地模拟的 Alidns 服务驱动 AliyunDDNS.sync(), 统计每轮的 API 调用数、耗时和峰值内存
+
+每个规模在独立的子进程中运行, 模拟服务运行在另一个进程中, 峰值内存只统计客户端, 且每个场景开始前清零:
+    python src/benchmark.py --sizes 10 100 1000 10000 --backend sdk --latency 0.02
+
+每个规模依次运行四个场景:
+    initial    空的本地状态, 快照中的记录都是旧地址, 全量对账后逐条更新
+    steady     地址未变化, 全部命中本地状态缓存
+    reconcile  强制全量对账, 只拉取快照
+    change     接口地址变化, 拉取快照后逐条更新
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Dict, Tuple
+
+from addresses import ScriptedAddressProvider
+from main import AliyunDDNS, AsyncAliyunDDNS, compile_domains, compile_profiles, compile_settings
+from mock_alidns import MockAlidnsServer, MockAlidnsState
+
+DEFAULT_SIZES = (10, 100, 1000, 10000)
+BENCHMARK_DOMAIN = 'example.com'
+BENCHMARK_INTERFACE = 'bench0'
+OLD_ADDRESS = '2001:db8::1'
+NEW_ADDRESSES = ('2408:8000::1', '2408:8000::2')
+READ_ACTIONS = {'DescribeDomainRecords'}
+
+
+def serve_mock(conn, size: int, args: argparse.Namespace) -> None:
+    """在独立进程中运行模拟服务, 通过管道返回接口地址, 之后按请求返回上次查询以来的调用统计"""
+    state = MockAlidnsState('secret', args.latency, args.jitter, args.server_qps, args.error_rate, seed=size)
+    for i in range(size):
+        state.add_record(BENCHMARK_DOMAIN, f'host{i}', 'AAAA', OLD_ADDRESS)
+    server = MockAlidnsServer(state)
+    server.start()
+    conn.send(server.endpoint)
+    reported = 0
+    while conn.recv() == 'stats':
+        with state.lock:
+            calls = Counter(state.calls[reported:])
+            reported = len(state.calls)
+            conn.send((dict(calls), state.throttled, state.errors))
+    server.shutdown()
+
+
+class MockProcess:
+    """模拟服务进程的句柄"""
+
+    def __init__(self, size: int, args: argparse.Namespace):
+        context = multiprocessing.get_context('spawn')
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=serve_mock, args=(child_conn, size, args), daemon=True)
+        self.process.start()
+        self.endpoint = self.conn.recv()
+
+    def stats(self) -> Tuple[Counter, int, int]:
+        """返回上次查询以来各接口的调用次数, 以及累计注入的限流和错误次数"""
+        self.conn.send('stats')
+        calls, throttled, errors = self.conn.recv()
+        return Counter(calls), throttled, errors
+
+    def close(self) -> None:
+        self.conn.send('stop')
+        self.process.join()
+
+
+def reset_peak_rss() -> None:
+    """清零本进程的峰值 RSS (VmHWM), 需要 Linux 4.0 以上; 不支持时峰值从进程启动开始累计"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def peak_rss_mb() -> float:
+    try:
+        with open('/proc/self/status') as f:
+            return int(re.search(r'VmHWM:\s+(\d+) kB', f.read()).group(1)) / 1024
+    except (OSError, AttributeError):
+        # Linux 上 ru_maxrss 的单位为 KB
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_scenario(name: str, ddns: AliyunDDNS, mock: MockProcess) -> Dict:
+    reset_peak_rss()
+    started = time.perf_counter()
+    report = ddns.sync()
+    seconds = time.perf_counter() - started
+    peak = peak_rss_mb()
+    calls, _, _ = mock.stats()
+    reads = sum(count for action, count in calls.items() if action in READ_ACTIONS)
+    return {
+        'name': name,
+        'reads': reads,
+        'writes': sum(calls.values()) - reads,
+        'calls': dict(calls),
+        'seconds': seconds,
+        'failed': report.failed,
+        'peak_rss_mb': peak,
+    }
+
+
+def run_size(size: int, args: argparse.Namespace) -> Dict:
+    """在当前进程中运行一个规模的全部场景, 模拟服务运行在子进程中"""
+    mock = MockProcess(size, args)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        settings = compile_settings({
+            'endpoint': mock.endpoint,
+            'api_protocol': 'http',
+            'api_qps': args.api_qps,
+            'max_workers': args.max_workers,
+            'state_file': os.path.join(workdir, 'state.json'),
+            'journal_file': os.path.join(workdir, 'journal.sqlite3'),
+        })
+        profiles = compile_profiles({'default': {'access_key_id': 'benchmark', 'access_key_secret': 'secret'}})
+        domains = compile_domains([{
+            'domain_name': BENCHMARK_DOMAIN,
+            'bind_interface': BENCHMARK_INTERFACE,
+            'type': 'AAAA',
+            'subdomain': [f'host{i}' for i in range(size)],
+        }], profiles, settings)
+        ddns_class = AsyncAliyunDDNS if args.backend == 'async' else AliyunDDNS
+        ddns = ddns_class(profiles, domains, settings)
+        # 地址时间线由阶段号驱动, 与本机网卡和真实时间无关
+        phase = [0]
+        ddns.address_provider = ScriptedAddressProvider(
+            [(index, BENCHMARK_INTERFACE, [address]) for index, address in enumerate(NEW_ADDRESSES)],
+            lambda: phase[0])
+
+        scenarios = [run_scenario('initial', ddns, mock), run_scenario('steady', ddns, mock)]
+        ddns.state.last_reconcile = 0
+        scenarios.append(run_scenario('reconcile', ddns, mock))
+        phase[0] = 1
+        scenarios.append(run_scenario('change', ddns, mock))
+        ddns.close()
+
+    _, throttled, errors = mock.stats()
+    mock.close()
+    return {
+        'size': size,
+        'throttled': throttled,
+        'errors': errors,
+        'scenarios': scenarios,
+    }
+
+
+RESULT_HEADER = f'{"规模":>8} {"场景":<10} {"读取":>6} {"写入":>7} {"失败":>6} {"耗时(s)":>9} {"峰值内存(MB)":>12}'
+
+
+def format_result(result: Dict) -> str:
+    lines = []
+    for scenario in result['scenarios']:
+        lines.append(f'{result["size"]:>8} {scenario["name"]:<10} {scenario["reads"]:>6} {scenario["writes"]:>7} '
+                     f'{scenario["failed"]:>6} {scenario["seconds"]:>9.3f} {scenario["peak_rss_mb"]:>12.1f}')
+    if result['throttled'] or result['errors']:
+        lines.append(f'{"":>8} 模拟服务注入限流 {result["throttled"]} 次, 错误 {result["errors"]} 次')
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='DDNS 同步端到端压测')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES), help='解析记录数量')
+    parser.add_argument('--backend', choices=('sdk', 'async'), default='sdk')
+    parser.add_argument('--max-workers', type=int, default=8)
+    parser.add_argument('--api-qps', type=float, default=0, help='客户端限流, 0 表示不限流')
+    parser.add_argument('--latency', type=float, default=0.0, help='模拟服务每次响应的延迟(秒)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='模拟服务响应延迟的随机抖动(秒)')
+    parser.add_argument('--server-qps', type=float, default=0, help='模拟服务每秒最多处理的请求数, 0 表示不限流')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='模拟服务返回 ServiceUnavailable 的概率')
+    parser.add_argument('--json', action='store_true', help='以 JSON 输出结果')
+    parser.add_argument('--child', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # 逐条记录的日志会主导耗时, 压测时只保留警告
+    logging.getLogger('DDNSLogger').setLevel(logging.WARNING)
+
+    if args.child is not None:
+        print(json.dumps(run_size(args.child, args)))
+        return
+
+    passthrough = [arg for arg in sys.argv[1:] if arg != '--json']
+    results = []
+    if not args.json:
+        print(RESULT_HEADER)
+    for size in args.sizes:
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), *passthrough, '--child', str(size)],
+                                stdout=subprocess.PIPE, check=True, text=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+        if not args.json:
+            print(format_result(results[-1]), flush=True)
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""解析记录变更日志, 保存在 SQLite 中, 供审计和 --rollback 使用"""
+
+import os
+import threading
+import time
+from typing import List, Optional, Tuple
+
+
+class ChangeJournal:
+    """只追加的解析记录变更日志, 保存在 SQLite (WAL 模式) 中, 按时间和 RecordId 建立索引
+
+    每次成功的创建或更新都会记录时间、RecordId、旧值、新值和 API 耗时, 用于审计和 --rollback.
+    数据库在第一次写入或查询时才打开.
+    """
+
+    SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS changes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ts REAL NOT NULL,
+            action TEXT NOT NULL,
+            record_id TEXT NOT NULL,
+            domain TEXT NOT NULL,
+            rr TEXT NOT NULL,
+            type TEXT NOT NULL,
+            line TEXT NOT NULL,
+            old_value TEXT,
+            new_value TEXT NOT NULL,
+            latency REAL
+        )""",
+        'CREATE INDEX IF NOT EXISTS changes_ts ON changes (ts)',
+        'CREATE INDEX IF NOT EXISTS changes_record ON changes (record_id, ts)',
+    )
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = None
+        # 写操作可能来自线程池中的多个线程
+        self.lock = threading.Lock()
+
+    def connect(self):
+        if self.conn is None:
+            import sqlite3
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+            with self.conn:
+                for statement in self.SCHEMA:
+                    self.conn.execute(statement)
+        return self.conn
+
+    def append(self, action: str, record_id: str, domain: str, rr: str, type: str, line: str,
+               old_value: Optional[str], new_value: str, latency: float, ts: Optional[float] = None) -> None:
+        with self.lock:
+            conn = self.connect()
+            with conn:
+                conn.execute(
+                    'INSERT INTO changes (ts, action, record_id, domain, rr, type, line, old_value, new_value, latency) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (time.time() if ts is None else ts, action, record_id, domain, rr, type, line,
+                     old_value, new_value, latency))
+
+    def values_at(self, timestamp: float) -> List[Tuple[str, str, str, str, str, Optional[str]]]:
+        """返回 timestamp 之后被修改过的记录在该时间点的值
+
+        每条记录取该时间点之后的第一次变更, 其旧值即为当时的值; 旧值为 None 表示记录是之后才创建的.
+        返回 (record_id, domain, rr, type, line, value) 列表.
+        """
+        with self.lock:
+            # SQLite 中与 MIN() 一起查询的其他列取自最小值所在的行
+            rows = self.connect().execute(
+                'SELECT record_id, domain, rr, type, line, old_value, MIN(ts) FROM changes '
+                'WHERE ts > ? GROUP BY record_id ORDER BY domain, rr, type', (timestamp,)).fetchall()
+        return [row[:6] for row in rows]
+
+    def close(self) -> None:
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""日志输出: 队列化的日志记录器、按天轮转压缩的日志文件、重复日志抑制和 journald 原生协议"""
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import socket
+import struct
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 保留的已轮转(压缩)日志文件数, 每天一个
+DEFAULT_LOG_RETENTION = 14
+# 相同的警告和错误在该时间(秒)内只输出一次, 0 表示不抑制
+DEFAULT_LOG_REPEAT_WINDOW = 600
+# 接口错误信息中每次不同的请求 ID, 比较日志是否重复时忽略
+REQUEST_ID_PATTERN = re.compile(r'Request ?ID:? ?[\w-]+', re.IGNORECASE)
+# journald 原生协议的套接字和日志标识
+JOURNAL_SOCKET = '/run/systemd/journal/socket'
+JOURNAL_IDENTIFIER = 'alicloud-ddns'
+# 日志级别下限 -> syslog 优先级, 低于 INFO 的为 7 (debug)
+SYSLOG_PRIORITIES = ((logging.CRITICAL, 2), (logging.ERROR, 3), (logging.WARNING, 4), (logging.INFO, 6))
+
+
+class GzipTimedRotatingFileHandler(logging.handlers.TimedRotatingFileHandler):
+    """每天零点轮转的日志文件, 轮转后的文件压缩为 .gz, 只保留最近 retention 个"""
+
+    def __init__(self, filename: str, retention: int = DEFAULT_LOG_RETENTION):
+        # 过期文件由 remove_expired 清理, 父类的 backupCount 按未压缩的文件名匹配, 不使用
+        super().__init__(filename, when='midnight', encoding='utf-8', delay=True)
+        self.retention = retention
+        self.namer = lambda name: f'{name}.gz'
+        self.rotator = self.compress
+
+    def compress(self, source: str, dest: str) -> None:
+        # 日志文件在轮转前被外部删除时跳过, 否则异常会使 rolloverAt 不再前进, 之后的日志全部丢失
+        if not os.path.exists(source):
+            return
+        import gzip
+        import shutil
+        with open(source, 'rb') as src, gzip.open(dest, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(source)
+        self.remove_expired()
+
+    def remove_expired(self) -> None:
+        directory, base = os.path.split(self.baseFilename)
+        # 后缀为 %Y-%m-%d, 按文件名排序即按日期排序
+        rotated = sorted(name for name in os.listdir(directory) if name.startswith(f'{base}.') and name.endswith('.gz'))
+        for name in rotated[:max(len(rotated) - self.retention, 0)]:
+            os.remove(os.path.join(directory, name))
+
+
+class RepeatedLogFilter(logging.Filter):
+    """同一位置输出的相同警告和错误在 window 秒内只保留第一条, 之后再次输出时附带期间被抑制的条数
+
+    日志记录带有 repeat_key 属性 (通过 extra 传入) 时按它判断是否相同, 用于消息中含有重试间隔、
+    次数等每次不同的值的日志; 否则按去除请求 ID 后的消息判断.
+    """
+
+    # 记录的日志种类超过该数量时清理已过期的条目
+    MAX_ENTRIES = 1024
+
+    def __init__(self, window: float = DEFAULT_LOG_REPEAT_WINDOW, clock: Callable[[], float] = time.monotonic):
+        super().__init__()
+        self.window = window
+        self.clock = clock
+        # (文件, 行号, repeat_key 或消息) -> [最近一次输出的时间, 之后被抑制的条数]
+        self.entries: Dict[Tuple[str, int, Any], List] = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING or self.window <= 0:
+            return True
+        repeat_key = getattr(record, 'repeat_key', None)
+        if repeat_key is None:
+            repeat_key = REQUEST_ID_PATTERN.sub('', record.getMessage())
+        key = (record.pathname, record.lineno, repeat_key)
+        now = self.clock()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and now - entry[0] < self.window:
+                entry[1] += 1
+                return False
+            if len(self.entries) >= self.MAX_ENTRIES:
+                self.entries = {k: v for k, v in self.entries.items() if now - v[0] < self.window}
+            self.entries[key] = [now, 0]
+        if entry is not None and entry[1]:
+            record.msg = f'{record.getMessage()} (此前 {self.window:g} 秒内已抑制 {entry[1]} 条相同日志)'
+            record.args = ()
+        return True
+
+
+def log_fields(action: str, domain: Optional[str] = None, rr: Optional[str] = None,
+               record_id: Optional[str] = None, latency: Optional[float] = None) -> Dict[str, Dict[str, str]]:
+    """日志记录附带的结构化字段, 作为 extra 传入; 写入 journald 时可以用 journalctl DOMAIN=... 过滤"""
+    fields = {'ACTION': action}
+    if domain is not None:
+        fields['DOMAIN'] = domain
+    if rr is not None:
+        fields['RR'] = rr
+    if record_id is not None:
+        fields['RECORD_ID'] = record_id
+    if latency is not None:
+        fields['LATENCY_MS'] = f'{latency * 1000:.0f}'
+    return {'journal_fields': fields}
+
+
+class JournalHandler(logging.Handler):
+    """通过 journald 原生协议写入日志, 每条日志一个数据报, 附带日志记录的 journal_fields"""
+
+    def __init__(self, path: str = JOURNAL_SOCKET, identifier: str = JOURNAL_IDENTIFIER):
+        super().__init__()
+        self.path = path
+        self.identifier = identifier
+        # 不 connect, journald 重启后仍可继续发送
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+
+    @staticmethod
+    def encode_field(name: str, value: Any) -> bytes:
+        data = str(value).encode('utf-8')
+        if b'\n' in data:
+            # 多行的值使用二进制格式: 字段名, 换行, 64 位小端长度, 值
+            return name.encode('ascii') + b'\n' + struct.pack('<Q', len(data)) + data + b'\n'
+        return name.encode('ascii') + b'=' + data + b'\n'
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            fields = {
+                'MESSAGE': self.format(record),
+                'PRIORITY': next((p for level, p in SYSLOG_PRIORITIES if record.levelno >= level), 7),
+                'SYSLOG_IDENTIFIER': self.identifier,
+                'CODE_FILE': record.pathname,
+                'CODE_LINE': record.lineno,
+                'CODE_FUNC': record.funcName,
+            }
+            fields.update(getattr(record, 'journal_fields', {}))
+            self.sock.sendto(b''.join(self.encode_field(k, v) for k, v in fields.items()), self.path)
+        except Exception:
+            self.handleError(record)
+
+    def close(self) -> None:
+        self.sock.close()
+        super().close()
+
+
+def setup_logger(running_in_systemd, retention=DEFAULT_LOG_RETENTION, repeat_window=DEFAULT_LOG_REPEAT_WINDOW):
+    """初始化日志记录器
+
+    日志记录只放入内存队列, 由后台线程写入文件和控制台, 同步过程不会因磁盘 I/O 阻塞.
+    在 systemd 中运行且 journald 可用时只写入 journald, 不再写日志文件.
+    重复调用时先停止之前的后台线程.
+    """
+    # 创建日志记录器
+    logger = logging.getLogger('DDNSLogger')
+    logger.setLevel(logging.INFO)
+    for handler in list(logger.handlers):
+        if isinstance(handler, logging.handlers.QueueHandler):
+            atexit.unregister(handler.listener.stop)
+            handler.listener.stop()
+            for listener_handler in handler.listener.handlers:
+                listener_handler.close()
+            logger.removeHandler(handler)
+            handler.close()
+
+    # 设置日志格式
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+
+    if running_in_systemd and os.path.exists(JOURNAL_SOCKET):
+        # journald 自带时间戳和优先级, 只发送消息本身
+        journal_handler = JournalHandler(JOURNAL_SOCKET)
+        journal_handler.setLevel(logging.INFO)
+        handlers = [journal_handler]
+    else:
+        # 统一日志目录为项目目录下的 logs
+        log_dir = os.path.join(os.path.dirname(__file__), '../logs')
+        if not os.path.exists(log_dir):
+            os.makedirs(log_dir)
+
+        # 创建文件处理器, 每天零点轮转
+        file_handler = GzipTimedRotatingFileHandler(os.path.join(log_dir, 'ddns.log'), retention)
+        file_handler.setLevel(logging.INFO)
+        file_handler.setFormatter(formatter)
+        handlers = [file_handler]
+
+    # 如果不是在systemd中运行，则添加控制台处理器
+    if not running_in_systemd:
+        console_handler = logging.StreamHandler()
+        console_handler.setLevel(logging.INFO)
+        console_handler.setFormatter(formatter)
+        handlers.append(console_handler)
+
+    # 添加队列处理器, 队列不限长度, 记录日志时不会等待
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(RepeatedLogFilter(repeat_window))
+    queue_handler.listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    queue_handler.listener.start()
+    logger.addHandler(queue_handler)
+    # 退出时写完队列中剩余的日志
+    atexit.register(queue_handler.listener.stop)
+
+    return logger
@@ -1,182 +1,1329 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import importlib
 import json
 import logging
 import os
+import random
+import signal
+import sys
+import threading
 import time
 import argparse
+from dataclasses import dataclass
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Any, Callable, Dict, Generator, Iterable, List, NamedTuple, Optional, Set, Tuple
+from urllib.parse import urlsplit
 
-import netifaces
 import toml
-from aliyunsdkcore.client import AcsClient
-from aliyunsdkalidns.request.v20150109.DescribeDomainRecordsRequest import DescribeDomainRecordsRequest
-from aliyunsdkalidns.request.v20150109.UpdateDomainRecordRequest import UpdateDomainRecordRequest
-from aliyunsdkalidns.request.v20150109.AddDomainRecordRequest import AddDomainRecordRequest
-from apscheduler.schedulers.blocking import BlockingScheduler
-
-def setup_logger(running_in_systemd):
-    """初始化日志记录器"""
-    # 统一日志目录为项目目录下的 logs
-    log_dir = os.path.join(os.path.dirname(__file__), '../logs')
-    if not os.path.exists(log_dir):
-        os.makedirs(log_dir)
-
-    # 生成日志文件名，使用当前日期
-    log_file = os.path.join(log_dir, f'ddns_{datetime.now().strftime("%Y%m%d")}.log')
-    
-    # 创建日志记录器
-    logger = logging.getLogger('DDNSLogger')
-    logger.setLevel(logging.INFO)
 
-    # 创建文件处理器
-    file_handler = logging.FileHandler(log_file, encoding='utf-8')
-    file_handler.setLevel(logging.INFO)
+from addresses import (ADDRESS_POLICIES, ADDRESS_SELECTORS, ADDRESS_SOURCES, DEFAULT_ADDRESS_POLICY,
+                       create_address_provider)
+from change_journal import ChangeJournal
+from log_handlers import DEFAULT_LOG_REPEAT_WINDOW, DEFAULT_LOG_RETENTION, log_fields, setup_logger
+from metrics import MetricsRegistry
+from netlink import DEFAULT_NETLINK_DEBOUNCE, NetlinkWatcher
+
+# DescribeDomainRecords 单页最大条数
+ZONE_PAGE_SIZE = 500
+# 未指定解析线路时使用的默认线路
+DEFAULT_LINE = 'default'
+# [credentials] 表对应的账号配置名, 以及账号未指定地域时使用的地域
+DEFAULT_PROFILE = 'default'
+DEFAULT_REGION = 'cn-hangzhou'
+
+# 解析记录索引键: (RR, Type, Line)
+RecordKey = Tuple[str, str, str]
+
+# 本地状态缓存文件, 变更日志默认保存在同一目录
+DEFAULT_STATE_FILE = os.path.join(os.path.dirname(__file__), '../state/ddns_state.json')
+# 本地状态缓存条目的默认有效期(秒)
+DEFAULT_STATE_TTL = 3600
+# 忽略本地缓存、全量对账的默认间隔(秒)
+DEFAULT_RECONCILE_INTERVAL = 86400
+# 定时检查的默认间隔(秒)
+DEFAULT_UPDATE_INTERVAL = 300
+# 检测到地址变化后缩短到的检查间隔(秒), 之后每轮稳定检查翻倍, 直到最大间隔
+DEFAULT_MIN_INTERVAL = 60
+DEFAULT_MAX_INTERVAL = 900
+# API 调用失败后首次重试的间隔(秒), 连续失败时指数退避并加入随机抖动
+DEFAULT_RETRY_INTERVAL = 15
+# 检查配置文件是否被修改的间隔(秒), 0 表示不监听; 检测到修改后等待写入完成的时间(秒)
+DEFAULT_CONFIG_WATCH_INTERVAL = 5
+CONFIG_SETTLE_DELAY = 0.5
+# 并发调用 API 的默认线程数
+DEFAULT_MAX_WORKERS = 8
+# 每个账号每秒最多发起的 API 请求数, 令牌桶默认容量为一秒的请求数
+DEFAULT_API_QPS = 10
+# 单次 API 调用的最大尝试次数, 以及重试退避的基准和上限(秒)
+DEFAULT_API_MAX_ATTEMPTS = 5
+DEFAULT_RETRY_BASE_DELAY = 0.5
+DEFAULT_RETRY_MAX_DELAY = 10
+# 一轮同步的截止时间(秒), 超时后不再发起新的 API 调用, 未完成的记录留到下一轮
+DEFAULT_SYNC_DEADLINE = 120
+# 可重试的错误码: 服务端临时错误和网络错误; Throttling.* 限流错误按前缀判断
+TRANSIENT_ERROR_CODES = {'ServiceUnavailable', 'InternalError', 'UnknownError', 'SDK.HttpError',
+                         'SDK.ServerUnreachable', 'NetworkError'}
+# 调用 API 使用的协议, 连接在多轮同步间复用
+DEFAULT_API_PROTOCOL = 'https'
+API_PROTOCOLS = ('http', 'https')
+# 同步引擎: sdk 使用 aliyunsdkcore 和线程池, async 使用 asyncio 和 aiohttp
+BACKENDS = ('sdk', 'async')
+# API 请求的连接/读取超时(秒)
+DEFAULT_API_CONNECT_TIMEOUT = 5
+DEFAULT_API_TIMEOUT = 10
+
+# --once 模式的退出码: 记录无变化 / 出错 / 有记录被创建或更新
+EXIT_UNCHANGED = 0
+EXIT_ERROR = 1
+EXIT_CHANGED = 2
+
+
+class StateCache:
+    """本地记录状态缓存, 保存最近一次确认过的解析值和 RecordId, 以 JSON 文件持久化"""
+
+    def __init__(self, path: str, ttl: float):
+        self.path = path
+        self.ttl = ttl
+        self.records: Dict[str, Dict] = {}
+        self.last_reconcile = 0.0
+        self.dirty = False
+        self.logger = logging.getLogger('DDNSLogger')
+        self.load()
+
+    @staticmethod
+    def key(domain: str, rr: str, type: str, line: str = DEFAULT_LINE) -> str:
+        return f'{domain}/{rr}/{type}/{line}'
+
+    def load(self) -> None:
+        """从磁盘加载缓存, 文件缺失或损坏时从空缓存开始"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.records = data.get('records', {})
+            self.last_reconcile = data.get('last_reconcile', 0.0)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f'读取状态缓存失败, 将重新对账: {str(e)}')
+
+    def save(self) -> None:
+        """有变更时原子地写回磁盘"""
+        if not self.dirty:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f'{self.path}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'last_reconcile': self.last_reconcile, 'records': self.records}, f)
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+        except OSError as e:
+            self.logger.warning(f'写入状态缓存失败: {str(e)}')
+
+    def is_fresh(self, key: str, value: str, now: float) -> bool:
+        """缓存中的值与期望值一致且未过期时返回 True"""
+        entry = self.records.get(key)
+        return entry is not None and entry['value'] == value and now - entry['confirmed_at'] < self.ttl
+
+    def confirm(self, key: str, value: str, record_id: Optional[str], now: float) -> None:
+        self.records[key] = {'value': value, 'record_id': record_id, 'confirmed_at': now}
+        self.dirty = True
+
+    def invalidate(self, key: str) -> None:
+        if self.records.pop(key, None) is not None:
+            self.dirty = True
+
+    def mark_reconciled(self, now: float) -> None:
+        self.last_reconcile = now
+        self.dirty = True
+
+
+class RecordTarget(NamedTuple):
+    """一条需要与云端对账的解析记录"""
+    domain: str
+    rr: str
+    type: str
+    line: str
+    value: str
+    key: str
+    # 完整域名, 用于日志和变更计划
+    fqdn: str
+
+
+@dataclass
+class SyncReport:
+    """一轮同步的汇总结果"""
+    checked: int = 0
+    unchanged: int = 0
+    created: int = 0
+    updated: int = 0
+    failed: int = 0
+    duration: float = 0.0
+    connections_opened: int = 0
+    connections_reused: int = 0
+
+    def record(self, status: str) -> None:
+        setattr(self, status, getattr(self, status) + 1)
+
+    def __str__(self) -> str:
+        return (f'检查 {self.checked}, 未变化 {self.unchanged}, 创建 {self.created}, '
+                f'更新 {self.updated}, 失败 {self.failed}, 耗时 {self.duration:.3f}s, '
+                f'新建连接 {self.connections_opened}, 复用连接 {self.connections_reused}')
+
+
+class PlanItem(NamedTuple):
+    """变更计划中的一项: create / update / noop, 快照不可用时为 skip"""
+    action: str
+    target: RecordTarget
+    record: Optional[Dict]
+
+
+# 同一域名内的执行顺序: 先更新已有记录, 再创建新记录
+PLAN_ORDER = {'update': 0, 'create': 1, 'noop': 2, 'skip': 3}
+
+
+def format_plan(plan: List[PlanItem], zone_pages: Dict[str, int]) -> str:
+    """将变更计划格式化为便于审阅的文本, 附带预计的 API 调用次数"""
+    symbols = {'create': '+', 'update': '~', 'noop': '=', 'skip': '!'}
+    lines = []
+    for item in plan:
+        target = item.target
+        name = f'{target.fqdn} {target.type} {target.line}'
+        if item.action == 'update':
+            lines.append(f'{symbols[item.action]} {name} ({item.record["RecordId"]}): '
+                         f'{item.record["Value"]} -> {target.value}')
+        elif item.action == 'skip':
+            lines.append(f'{symbols[item.action]} {name}: 域名快照获取失败, 跳过')
+        else:
+            lines.append(f'{symbols[item.action]} {name} -> {target.value}')
+
+    counts = {action: sum(1 for item in plan if item.action == action) for action in symbols}
+    writes = counts['create'] + counts['update']
+    lines.append(f'计划: 创建 {counts["create"]}, 更新 {counts["update"]}, 无变化 {counts["noop"]}, '
+                 f'跳过 {counts["skip"]}; 预计 API 调用: 读取 {sum(zone_pages.values())}, 写入 {writes}')
+    return '\n'.join(lines)
+
+
+class RateLimiter:
+    """线程安全的令牌桶限流器, 以 qps 的速率补充令牌, 最多积累 burst 个, 允许短时突发"""
+
+    def __init__(self, qps: float, burst: Optional[float] = None):
+        self.rate = qps
+        self.capacity = burst or max(qps, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """取走一个令牌, 返回需要等待的秒数; 令牌不足时记为欠账, 后续请求依次排队"""
+        if self.rate <= 0:
+            return 0.0
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens -= 1
+            return max(-self.tokens / self.rate, 0.0)
+
+    def drain(self) -> None:
+        """被服务端限流时清空积累的令牌, 让同一账号的其他请求放慢速度"""
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, 0.0)
+
+
+class DeadlineExceeded(Exception):
+    """本轮同步已超过截止时间"""
+
+
+def api_error_info(error: Exception) -> Tuple[str, int]:
+    """提取 SDK 异常或 AlidnsError 的错误码和 HTTP 状态码"""
+    if hasattr(error, 'get_error_code'):
+        status = error.get_http_status() if hasattr(error, 'get_http_status') else 0
+        return error.get_error_code() or '', status or 0
+    return getattr(error, 'code', '') or '', getattr(error, 'status', 0) or 0
+
+
+def is_throttling_error(error: Exception) -> bool:
+    code, status = api_error_info(error)
+    return code.startswith('Throttling') or status == 429
+
+
+def is_transient_error(error: Exception) -> bool:
+    """限流、超时、5xx 等可以重试的错误"""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    code, status = api_error_info(error)
+    return is_throttling_error(error) or code in TRANSIENT_ERROR_CODES or status >= 500
+
+
+class RetryPolicy:
+    """临时错误的重试策略, 使用 decorrelated jitter 退避, 等待不会超过本轮同步的截止时间"""
+
+    def __init__(self, max_attempts: int = DEFAULT_API_MAX_ATTEMPTS, base_delay: float = DEFAULT_RETRY_BASE_DELAY,
+                 max_delay: float = DEFAULT_RETRY_MAX_DELAY):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt: int, previous: float, error: Exception, deadline: float) -> Optional[float]:
+        """返回第 attempt 次尝试失败后的等待时间, 不应重试时返回 None"""
+        if attempt >= self.max_attempts or not is_transient_error(error):
+            return None
+        delay = min(self.max_delay, random.uniform(self.base_delay, max(previous, self.base_delay) * 3))
+        if time.monotonic() + delay >= deadline:
+            return None
+        return delay
+
+
+class ClientPool:
+    """按 (账号配置, 地域) 缓存 API 客户端, 客户端在第一次使用时创建并在多轮同步间复用"""
 
-    # 设置日志格式
-    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-    file_handler.setFormatter(formatter)
+    def __init__(self, factory: Callable[[str, str], Any]):
+        self.factory = factory
+        self.clients: Dict[Tuple[str, str], Any] = {}
+        self.lock = threading.Lock()
 
-    # 添加处理器
-    logger.addHandler(file_handler)
+    def get(self, profile: str, region: str):
+        key = (profile, region)
+        with self.lock:
+            client = self.clients.get(key)
+            if client is None:
+                client = self.clients[key] = self.factory(profile, region)
+        return client
 
-    # 如果不是在systemd中运行，则添加控制台处理器
-    if not running_in_systemd:
-        console_handler = logging.StreamHandler()
-        console_handler.setLevel(logging.INFO)
-        console_handler.setFormatter(formatter)
-        logger.addHandler(console_handler)
+    def values(self) -> List:
+        with self.lock:
+            return list(self.clients.values())
+
+    def discard(self, profiles: Set[str]) -> List:
+        """移除指定账号的客户端, 返回被移除的客户端, 之后再使用时按新的配置重新创建"""
+        with self.lock:
+            removed = [key for key in self.clients if key[0] in profiles]
+            return [self.clients.pop(key) for key in removed]
+
+
+@dataclass(frozen=True)
+class CredentialProfile:
+    """一个阿里云账号: 访问凭证及可选的地域、接口地址和限流参数, 限流参数为 None 时取 [settings] 中的值"""
+    __slots__ = ('name', 'access_key_id', 'access_key_secret', 'region', 'endpoint', 'api_qps', 'api_burst')
+    name: str
+    access_key_id: str
+    access_key_secret: str
+    region: str
+    endpoint: Optional[str]
+    api_qps: Optional[float]
+    api_burst: Optional[float]
+
+
+@dataclass(frozen=True)
+class RecordSpec:
+    """配置中的一条解析记录, 完整域名和本地状态缓存的键在加载配置时算好"""
+    __slots__ = ('domain', 'rr', 'type', 'line', 'fqdn', 'key')
+    domain: str
+    rr: str
+    type: str
+    line: str
+    fqdn: str
+    key: str
+
+
+@dataclass(frozen=True)
+class ZoneConfig:
+    """一个 [[domains]] 配置块; records 按记录类型分组, 同一类型的记录共用一次接口地址查询"""
+    __slots__ = ('domain', 'interface', 'types', 'profile', 'region', 'address_policy', 'allow_private', 'records')
+    domain: str
+    interface: str
+    types: Tuple[str, ...]
+    profile: str
+    region: str
+    address_policy: str
+    allow_private: bool
+    records: Tuple[Tuple[str, Tuple[RecordSpec, ...]], ...]
+
+
+@dataclass(frozen=True)
+class Settings:
+    """[settings] 中的运行参数, 加载配置时校验并填入默认值; 各项含义见 config.toml"""
+    __slots__ = ('state_file', 'journal_file', 'state_ttl', 'reconcile_interval', 'update_interval', 'min_interval',
+                 'max_interval', 'retry_interval', 'netlink_watch', 'netlink_debounce', 'config_watch_interval',
+                 'max_workers', 'api_qps', 'api_burst', 'api_max_attempts', 'retry_base_delay', 'retry_max_delay',
+                 'sync_deadline', 'backend', 'endpoint', 'api_protocol', 'api_timeout', 'api_connect_timeout',
+                 'metrics_listen', 'log_retention', 'log_repeat_window', 'address_source', 'address_script',
+                 'address_policy')
+    state_file: str
+    journal_file: str
+    state_ttl: float
+    reconcile_interval: float
+    update_interval: float
+    min_interval: float
+    max_interval: float
+    retry_interval: float
+    netlink_watch: bool
+    netlink_debounce: float
+    config_watch_interval: float
+    max_workers: int
+    api_qps: float
+    api_burst: Optional[float]
+    api_max_attempts: int
+    retry_base_delay: float
+    retry_max_delay: float
+    sync_deadline: float
+    backend: str
+    endpoint: Optional[str]
+    api_protocol: str
+    api_timeout: float
+    api_connect_timeout: float
+    metrics_listen: Optional[str]
+    log_retention: int
+    log_repeat_window: float
+    address_source: str
+    address_script: Optional[str]
+    address_policy: str
+
+
+# config_value 的必填项标记
+REQUIRED = object()
+
+
+def config_value(block: Dict, key: str, expected: Any, where: str, default: Any = REQUIRED) -> Any:
+    """读取一个配置项并检查类型, 缺少必填项或类型不符时抛出 ValueError"""
+    if key not in block:
+        if default is REQUIRED:
+            raise ValueError(f'{where} 缺少 {key}')
+        return default
+    value = block[key]
+    # bool 是 int 的子类, 需要数值时不接受 true / false
+    types = expected if isinstance(expected, tuple) else (expected,)
+    if not isinstance(value, expected) or (isinstance(value, bool) and bool not in types):
+        raise ValueError(f'{where} 的 {key} 类型错误: {value!r}')
+    return value
+
+
+def record_fqdn(rr: str, domain: str) -> str:
+    return domain if rr == '@' else f'{rr}.{domain}'
+
+
+def compile_profiles(config_profiles: Dict[str, Dict]) -> Dict[str, CredentialProfile]:
+    """校验账号配置并转换为 CredentialProfile"""
+    profiles = {}
+    for name, profile in config_profiles.items():
+        where = f'账号配置 {name}'
+        if not isinstance(profile, dict) or not profile.get('access_key_id') or not profile.get('access_key_secret'):
+            raise ValueError(f'{where} 未设置阿里云访问凭证')
+        profiles[name] = CredentialProfile(
+            name, str(profile['access_key_id']), str(profile['access_key_secret']),
+            config_value(profile, 'region', str, where, DEFAULT_REGION),
+            config_value(profile, 'endpoint', str, where, None),
+            config_value(profile, 'api_qps', (int, float), where, None),
+            config_value(profile, 'api_burst', (int, float), where, None))
+    return profiles
+
+
+def compile_settings(config_settings: Dict) -> Settings:
+    """校验 [settings] 并填入默认值, 配置有误时在启动阶段抛出 ValueError"""
+    where = '[settings]'
+    if not isinstance(config_settings, dict):
+        raise ValueError(f'{where} 格式错误')
+    unknown = set(config_settings) - set(Settings.__slots__)
+    if unknown:
+        logging.getLogger('DDNSLogger').warning(f'{where} 中的未知配置项将被忽略: {", ".join(sorted(unknown))}')
+
+    def number(key: str, default: Optional[float], positive: bool = False, integer: bool = False) -> Any:
+        value = config_value(config_settings, key, int if integer else (int, float), where, default)
+        if value is not None and (value <= 0 if positive else value < 0):
+            raise ValueError(f'{where} 的 {key} 必须{"大于 0" if positive else "不小于 0"}: {value!r}')
+        return value
+
+    def choice(key: str, default: str, choices: Tuple[str, ...]) -> str:
+        value = config_value(config_settings, key, str, where, default)
+        if value not in choices:
+            raise ValueError(f'{where} 的 {key} 必须是 {" / ".join(choices)} 之一: {value!r}')
+        return value
+
+    state_file = config_value(config_settings, 'state_file', str, where, DEFAULT_STATE_FILE)
+    settings = Settings(
+        state_file=state_file,
+        journal_file=config_value(config_settings, 'journal_file', str, where,
+                                  os.path.join(os.path.dirname(state_file), 'journal.sqlite3')),
+        state_ttl=number('state_ttl', DEFAULT_STATE_TTL),
+        reconcile_interval=number('reconcile_interval', DEFAULT_RECONCILE_INTERVAL),
+        update_interval=number('update_interval', DEFAULT_UPDATE_INTERVAL, positive=True),
+        min_interval=number('min_interval', DEFAULT_MIN_INTERVAL, positive=True),
+        max_interval=number('max_interval', DEFAULT_MAX_INTERVAL, positive=True),
+        retry_interval=number('retry_interval', DEFAULT_RETRY_INTERVAL, positive=True),
+        netlink_watch=config_value(config_settings, 'netlink_watch', bool, where, False),
+        netlink_debounce=number('netlink_debounce', DEFAULT_NETLINK_DEBOUNCE),
+        config_watch_interval=number('config_watch_interval', DEFAULT_CONFIG_WATCH_INTERVAL),
+        max_workers=number('max_workers', DEFAULT_MAX_WORKERS, positive=True, integer=True),
+        api_qps=number('api_qps', DEFAULT_API_QPS),
+        api_burst=number('api_burst', None, positive=True),
+        api_max_attempts=number('api_max_attempts', DEFAULT_API_MAX_ATTEMPTS, positive=True, integer=True),
+        retry_base_delay=number('retry_base_delay', DEFAULT_RETRY_BASE_DELAY),
+        retry_max_delay=number('retry_max_delay', DEFAULT_RETRY_MAX_DELAY),
+        sync_deadline=number('sync_deadline', DEFAULT_SYNC_DEADLINE, positive=True),
+        backend=choice('backend', BACKENDS[0], BACKENDS),
+        endpoint=config_value(config_settings, 'endpoint', str, where, None),
+        api_protocol=choice('api_protocol', DEFAULT_API_PROTOCOL, API_PROTOCOLS),
+        api_timeout=number('api_timeout', DEFAULT_API_TIMEOUT, positive=True),
+        api_connect_timeout=number('api_connect_timeout', DEFAULT_API_CONNECT_TIMEOUT, positive=True),
+        metrics_listen=config_value(config_settings, 'metrics_listen', str, where, None),
+        log_retention=number('log_retention', DEFAULT_LOG_RETENTION, integer=True),
+        log_repeat_window=number('log_repeat_window', DEFAULT_LOG_REPEAT_WINDOW),
+        address_source=choice('address_source', 'auto', ADDRESS_SOURCES),
+        address_script=config_value(config_settings, 'address_script', str, where, None),
+        address_policy=choice('address_policy', DEFAULT_ADDRESS_POLICY, ADDRESS_POLICIES),
+    )
+    if settings.min_interval > settings.max_interval:
+        raise ValueError(f'{where} 的 min_interval 不能大于 max_interval')
+    if settings.address_source == 'scripted' and not settings.address_script:
+        raise ValueError(f'{where} 的地址来源 scripted 需要设置 address_script')
+    return settings
+
+
+def compile_domains(config_domains: List[Dict], profiles: Dict[str, CredentialProfile],
+                    settings: Settings) -> Tuple[ZoneConfig, ...]:
+    """校验 [[domains]] 配置块并展开为解析记录, 配置有误时在启动阶段抛出 ValueError
+
+    多个配置块中的相同记录只保留第一个, 绑定的接口或地址策略不同时输出警告.
+    """
+    routes: Dict[str, Tuple[str, str]] = {}
+    # 记录键 -> 首次出现时的 (接口, 地址策略, 是否允许私有地址)
+    seen: Dict[str, Tuple[str, str, bool]] = {}
+    zones = []
+    for index, block in enumerate(config_domains, 1):
+        where = f'第 {index} 个 [[domains]] 配置块'
+        if not isinstance(block, dict):
+            raise ValueError(f'{where} 格式错误')
+        domain = config_value(block, 'domain_name', str, where)
+        where = f'{where} ({domain})'
+        interface = config_value(block, 'bind_interface', str, where)
+        # type 可以是单个记录类型, 也可以是列表, 如 ["A", "AAAA"]
+        types = config_value(block, 'type', (str, list), where)
+        types = (types,) if isinstance(types, str) else tuple(types)
+        if not types:
+            raise ValueError(f'{where} 的 type 不能为空')
+        for type in types:
+            if type not in ADDRESS_SELECTORS:
+                raise ValueError(f'{where} 不支持的记录类型: {type}')
+        subdomains = config_value(block, 'subdomain', (str, list), where)
+        subdomains = (subdomains,) if isinstance(subdomains, str) else tuple(subdomains)
+        if not subdomains or not all(isinstance(rr, str) and rr for rr in subdomains):
+            raise ValueError(f'{where} 的 subdomain 必须是非空的字符串列表')
+        line = config_value(block, 'line', str, where, DEFAULT_LINE)
+        profile = config_value(block, 'profile', str, where, DEFAULT_PROFILE)
+        if profile not in profiles:
+            raise ValueError(f'域名 {domain} 引用了不存在的账号配置: {profile}')
+        region = config_value(block, 'region', str, where, profiles[profile].region)
+        if routes.setdefault(domain, (profile, region)) != (profile, region):
+            raise ValueError(f'域名 {domain} 在多个配置块中使用了不同的账号或地域')
+        policy = config_value(block, 'address_policy', str, where, settings.address_policy)
+        if policy not in ADDRESS_POLICIES:
+            raise ValueError(f'{where} 的 address_policy 必须是 {" / ".join(ADDRESS_POLICIES)} 之一')
+        allow_private = config_value(block, 'allow_private', bool, where, False)
+
+        records = []
+        for type in types:
+            specs = []
+            for rr in subdomains:
+                spec = RecordSpec(domain, rr, type, line, record_fqdn(rr, domain), StateCache.key(domain, rr, type, line))
+                binding = (interface, policy, allow_private)
+                first = seen.setdefault(spec.key, binding)
+                if first is binding:
+                    specs.append(spec)
+                elif first != binding:
+                    logging.getLogger('DDNSLogger').warning(
+                        f'解析记录 {spec.fqdn} ({type}) 在多个配置块中绑定了不同的接口或地址策略, 使用第一个')
+            if specs:
+                records.append((type, tuple(specs)))
+        zones.append(ZoneConfig(domain, interface, types, profile, region, policy, allow_private, tuple(records)))
+    return tuple(zones)
+
+
+class ConfigWatcher:
+    """定时检查配置文件 (含 .local.toml 和 conf.d/*.toml) 的修改时间和大小, 变化时回调"""
+
+    def __init__(self, config_file: str, callback: Callable[[], None],
+                 interval: float = DEFAULT_CONFIG_WATCH_INTERVAL):
+        self.config_file = config_file
+        self.callback = callback
+        self.interval = interval
+        self.logger = logging.getLogger('DDNSLogger')
+        self.signature = self.snapshot()
+
+    def snapshot(self) -> Tuple[Tuple[str, int, int], ...]:
+        files = []
+        for path in config_files(self.config_file):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((path, stat.st_mtime_ns, stat.st_size))
+        return tuple(files)
+
+    def run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            if self.snapshot() == self.signature:
+                continue
+            # 编辑器保存时可能分多次写入, 等待写入完成后再读取
+            time.sleep(CONFIG_SETTLE_DELAY)
+            self.signature = self.snapshot()
+            self.logger.info('检测到配置文件变化, 重新加载配置')
+            try:
+                self.callback()
+            except Exception as e:
+                self.logger.error(f'重新加载配置失败: {str(e)}')
+
+    def start(self) -> threading.Thread:
+        thread = threading.Thread(target=self.run, name='config-watcher', daemon=True)
+        thread.start()
+        return thread
 
-    return logger
 
 class AliyunDDNS:
-    def __init__(self, access_key_id: str, access_key_secret: str, domains: List[Dict[str, str]]):
-        self.client = AcsClient(access_key_id, access_key_secret, 'cn-hangzhou')
+    def __init__(self, profiles: Dict[str, CredentialProfile], domains: Tuple[ZoneConfig, ...],
+                 settings: Optional[Settings] = None):
+        settings = settings if settings is not None else compile_settings({})
+        # 账号配置名 -> 访问凭证及可选的 region / api_qps / endpoint
+        self.profiles = profiles
+        self.settings = settings
+        self.api_protocol = settings.api_protocol
         self.domains = domains
+        # 域名 -> (账号配置名, 地域)
+        self.routes = self.build_routes(domains)
+        # 每个 (账号, 地域) 一个客户端, 在第一次调用 API 时才创建, 本地状态缓存命中时无需加载 SDK
+        self.clients = ClientPool(self.create_client)
         self.logger = logging.getLogger('DDNSLogger')
+        # 本地状态缓存, 地址未变化且缓存未过期时跳过所有 API 调用
+        self.state = StateCache(settings.state_file, settings.state_ttl)
+        self.reconcile_interval = settings.reconcile_interval
+        # 解析记录变更日志, journal_file 设为空字符串时不记录
+        self.journal = ChangeJournal(settings.journal_file) if settings.journal_file else None
+        # 定时任务与 netlink 事件可能同时触发同步, 同一时间只允许一轮
+        self.sync_lock = threading.Lock()
+        # 每个账号一个调用 API 的线程池, 限流等待和重试只占用本账号的线程
+        self.max_workers = settings.max_workers
+        self.executors: Dict[str, Any] = {}
+        # 每个账号独立的限流预算, 一个账号被限流时不影响其他账号的同步
+        self.rate_limiters = {name: self.create_rate_limiter(profile) for name, profile in profiles.items()}
+        # 限流、超时和 5xx 错误的重试策略, 以及每轮同步的截止时间
+        self.retry_policy = RetryPolicy(settings.api_max_attempts, settings.retry_base_delay, settings.retry_max_delay)
+        self.sync_deadline = settings.sync_deadline
+        self.deadline = float('inf')
+        # 本轮同步的域名解析记录快照: domain -> {(RR, Type, Line): record}
+        self.zones: Dict[str, Dict[RecordKey, Dict]] = {}
+        # 接口地址来源, 每轮同步开始时刷新一次, 由所有域名配置共享
+        self.need_ipv4 = any('A' in zone.types for zone in domains)
+        self.address_provider = create_address_provider(settings.address_source, self.need_ipv4,
+                                                        settings.address_script)
+        # 本地状态缓存和对账使用的时钟, 回放时替换为模拟时钟
+        self.clock: Callable[[], float] = time.time
+        # 本轮拉取每个域名快照所用的分页数, 用于估算 API 调用次数
+        self.zone_pages: Dict[str, int] = {}
+        # 每条记录最近一次写入或对账的结果, 未变化的记录只在结果发生转变时输出日志
+        self.record_status: Dict[str, str] = {}
+        self.init_metrics()
+
+    def init_metrics(self) -> None:
+        """注册同步过程的耗时与计数指标"""
+        self.metrics = MetricsRegistry()
+        self.sync_duration = self.metrics.histogram(
+            'ddns_sync_duration_seconds', '一轮同步的耗时')
+        self.interface_duration = self.metrics.histogram(
+            'ddns_interface_lookup_duration_seconds', '读取接口地址的耗时', ['interface'])
+        self.api_duration = self.metrics.histogram(
+            'ddns_api_call_duration_seconds', 'Alidns API 调用耗时', ['action'])
+        self.api_errors = self.metrics.counter(
+            'ddns_api_errors_total', 'Alidns API 调用失败次数', ['action'])
+        self.api_retries = self.metrics.counter(
+            'ddns_api_retries_total', 'Alidns API 调用因临时错误重试的次数', ['action'])
+        self.records_total = self.metrics.counter(
+            'ddns_records_total', '按结果统计的解析记录数', ['result'])
+        self.connections_total = self.metrics.counter(
+            'ddns_api_connections_total', '新建和复用的 API 连接数', ['state'])
+        self.record_last_change = self.metrics.gauge(
+            'ddns_record_last_change_timestamp_seconds', '解析记录最近一次被创建或更新的时间',
+            ['domain', 'rr', 'type'])
+
+    def build_routes(self, domains: Tuple[ZoneConfig, ...]) -> Dict[str, Tuple[str, str]]:
+        """每个域名使用的账号和地域, 加载配置时已保证同一域名只属于一个账号"""
+        return {zone.domain: (zone.profile, zone.region) for zone in domains}
+
+    def create_rate_limiter(self, profile: CredentialProfile) -> RateLimiter:
+        qps = profile.api_qps if profile.api_qps is not None else self.settings.api_qps
+        burst = profile.api_burst if profile.api_burst is not None else self.settings.api_burst
+        return RateLimiter(qps, burst)
+
+    def reload(self, profiles: Dict[str, CredentialProfile], domains: Tuple[ZoneConfig, ...]) -> Set[str]:
+        """应用重新加载的账号和域名配置, 返回新增或变化的配置块绑定的接口
+
+        未变化的配置块保留本地状态缓存, 只需同步返回的接口; 被移除的配置块不会删除已有的解析记录.
+        """
+        routes = self.build_routes(domains)
+        with self.sync_lock:
+            changed_profiles = {name for name, profile in profiles.items() if self.profiles.get(name) != profile}
+            # 凭证或限流参数变化的账号重新创建客户端和令牌桶
+            self.close_clients(self.clients.discard(changed_profiles))
+            for name in changed_profiles:
+                self.rate_limiters[name] = self.create_rate_limiter(profiles[name])
 
-    def get_interface_ipv6(self, interface: str) -> Optional[str]:
-        """获取指定接口的公网IPv6地址"""
+            previous = set(self.domains)
+            changed = [zone for zone in domains if zone not in previous or zone.profile in changed_profiles]
+            # 按 (域名, 接口) 识别配置块, 修改过的配置块不计为移除
+            removed = len({(zone.domain, zone.interface) for zone in previous}
+                          - {(zone.domain, zone.interface) for zone in domains})
+            self.profiles, self.domains, self.routes = profiles, domains, routes
+
+            need_ipv4 = any('A' in zone.types for zone in domains)
+            if need_ipv4 and not self.need_ipv4:
+                self.address_provider = create_address_provider(self.settings.address_source, True,
+                                                                self.settings.address_script)
+            self.need_ipv4 = need_ipv4
+        self.logger.info(f'配置已重新加载: 新增或修改 {len(changed)} 个域名配置块, 移除 {removed} 个')
+        return {zone.interface for zone in changed}
+
+    def close_clients(self, clients: List) -> None:
+        # SDK 客户端没有需要显式释放的资源
+        pass
+
+    def endpoint(self, profile: str) -> Optional[str]:
+        """账号配置中的 endpoint 优先于全局设置"""
+        return self.profiles[profile].endpoint or self.settings.endpoint
+
+    def executor(self, profile: str):
+        # 只有需要调用 API 时才创建线程池; 只在持有 sync_lock 的线程中调用, 无需加锁
+        executor = self.executors.get(profile)
+        if executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            executor = self.executors[profile] = ThreadPoolExecutor(self.max_workers,
+                                                                    thread_name_prefix=f'alidns-{profile}')
+        return executor
+
+    def map_by_account(self, fn: Callable[[Any], Any], items: List, domains: Iterable[str]) -> List:
+        """按域名所属账号把任务分发到各账号的线程池, 一个账号被限流时不会拖慢其他账号; 结果保持输入顺序"""
+        futures = [self.executor(self.routes[domain][0]).submit(fn, item) for item, domain in zip(items, domains)]
+        return [future.result() for future in futures]
+
+    def create_client(self, profile: str, region: str):
+        # AcsClient 内部持有一个 requests Session, 客户端在多轮同步间复用即可复用连接;
+        # 连接池大小与并发线程数一致, 避免并发时超出池容量的连接被丢弃后重新握手
+        # aliyunsdkcore 导入较慢, 推迟到第一次调用 API 时
+        from aliyunsdkcore.client import AcsClient
+        credentials = self.profiles[profile]
+        return AcsClient(credentials.access_key_id, credentials.access_key_secret, region,
+                         connect_timeout=self.settings.api_connect_timeout,
+                         timeout=self.settings.api_timeout,
+                         pool_size=self.max_workers)
+
+    def new_request(self, action: str):
+        """创建指定接口的 SDK 请求对象, 请求类在第一次使用时导入"""
+        module = importlib.import_module(f'aliyunsdkalidns.request.v20150109.{action}Request')
+        request = getattr(module, f'{action}Request')()
+        request.set_accept_format('json')
+        request.set_protocol_type(self.api_protocol)
+        return request
+
+    def connection_stats(self) -> Dict[str, int]:
+        """统计连接池累计新建和复用的连接数"""
+        opened = requests = 0
+        for client in self.clients.values():
+            for adapter in client.session.adapters.values():
+                pools = adapter.poolmanager.pools
+                for key in pools.keys():
+                    pool = pools[key]
+                    opened += pool.num_connections
+                    requests += pool.num_requests
+        return {'opened': opened, 'reused': requests - opened}
+
+    def close(self) -> None:
+        for executor in self.executors.values():
+            executor.shutdown(wait=False)
+        if self.journal is not None:
+            self.journal.close()
+
+    def journal_change(self, action: str, record_id: str, domain: str, rr: str, type: str, line: str,
+                       old_value: Optional[str], new_value: str, latency: float) -> None:
+        """记录一次成功的写操作, 日志写入失败不影响同步结果"""
+        if self.journal is None:
+            return
         try:
-            if interface not in netifaces.interfaces():
-                self.logger.warning(f'接口 {interface} 不存在')
-                return None
+            self.journal.append(action, record_id, domain, rr, type, line, old_value, new_value, latency)
+        except Exception as e:
+            self.logger.error(f'写入变更日志失败 ({rr}.{domain}): {str(e)}')
 
-            addrs = netifaces.ifaddresses(interface)
-            if netifaces.AF_INET6 not in addrs:
-                self.logger.warning(f'接口 {interface} 没有IPv6地址')
-                return None
+    def begin_cycle(self) -> None:
+        """开始一轮同步, 之后的 API 调用和重试都不会超过本轮的截止时间"""
+        self.deadline = time.monotonic() + self.sync_deadline
 
-            ipv6_addrs = []
-            for addr in addrs[netifaces.AF_INET6]:
-                ip = addr['addr'].split('%')[0]  # 去除接口ID
-
-                # 过滤非公网IPv6地址
-                if any([
-                    ip.startswith('fe80:'),
-                    ip.startswith('fc00:'),
-                    ip.startswith('fd00:'),
-                    ip == '::1',
-                    ip.startswith('2002:'),
-                    ip.startswith('3ffe:'),
-                    ip.startswith('fd'),
-                    ':' not in ip
-                ]):
-                    continue
+    def check_deadline(self, action: str, wait: float = 0.0) -> None:
+        """等待令牌后会超过截止时间时不再发出请求, 未完成的记录留到下一轮"""
+        if time.monotonic() + wait >= self.deadline:
+            raise DeadlineExceeded(f'本轮同步已超过截止时间 {self.sync_deadline} 秒, 放弃调用 {action}')
 
-                # 如果是公网IPv6地址
-                if ip.startswith('2') or ip.startswith('3'):
-                    ipv6_addrs.append(ip)
+    def retry_delay(self, action: str, attempt: int, previous: float, error: Exception, limiter: RateLimiter
+                    ) -> Optional[float]:
+        """记录一次失败的调用, 返回重试前的等待时间, 不再重试时返回 None"""
+        self.api_errors.inc(1, action)
+        delay = self.retry_policy.backoff(attempt, previous, error, self.deadline)
+        if delay is None:
+            return None
+        if is_throttling_error(error):
+            limiter.drain()
+        self.api_retries.inc(1, action)
+        # 重试间隔和次数每次不同, 按接口和错误码合并重复的日志
+        code = api_error_info(error)[0] or type(error).__name__
+        self.logger.warning(f'调用 {action} 失败, {delay:.1f} 秒后重试 (第 {attempt} 次失败): {str(error)}',
+                            extra={**log_fields(action), 'repeat_key': (action, code)})
+        return delay
 
-            if ipv6_addrs:
-                # 按字符串长度排序，优先选择非临时地址
-                ipv6_addrs.sort(key=len)
-                return ipv6_addrs[0]
-            else:
-                self.logger.warning(f'接口 {interface} 没有公网IPv6地址')
+    def do_action(self, request, domain: str) -> bytes:
+        """使用域名所属账号的客户端, 经过该账号的限流后发起 API 请求, 临时错误按退避策略重试"""
+        profile, region = self.routes[domain]
+        limiter = self.rate_limiters[profile]
+        endpoint = self.endpoint(profile)
+        if endpoint:
+            # 自定义接口地址 (如本地模拟服务), 只取主机和端口
+            request.set_endpoint(urlsplit(endpoint).netloc)
+        action = request.get_action_name()
+        delay = self.retry_policy.base_delay
+        attempt = 0
+        while True:
+            attempt += 1
+            wait = limiter.reserve()
+            self.check_deadline(action, wait)
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                # SDK 每次发送都会重新生成签名随机数和时间戳, 可以直接重发同一个请求
+                with self.api_duration.time(action):
+                    return self.clients.get(profile, region).do_action_with_exception(request)
+            except Exception as e:
+                delay = self.retry_delay(action, attempt, delay, e, limiter)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+
+    def get_interface_address(self, interface: str, type: str = 'AAAA', policy: str = DEFAULT_ADDRESS_POLICY,
+                              allow_private: bool = False) -> Optional[str]:
+        """按记录类型和地址选择策略获取指定接口的公网地址"""
+        family, select = ADDRESS_SELECTORS[type]
+        try:
+            addrs = self.address_provider.addresses(interface)
+            if addrs is None:
+                self.logger.warning(f'接口 {interface} 不存在')
                 return None
 
+            ip = select(addrs, policy, allow_private)
+            if ip is None:
+                self.logger.warning(f'接口 {interface} 没有公网{family}地址')
+            return ip
+
         except Exception as e:
-            self.logger.error(f'获取接口 {interface} 的IPv6地址失败: {str(e)}')
+            self.logger.error(f'获取接口 {interface} 的{family}地址失败: {str(e)}')
             return None
 
-    def get_domain_records(self, domain: str, rr: str,type:str) -> Optional[Dict]:
-        """获取域名解析记录"""
-        request = DescribeDomainRecordsRequest()
-        request.set_accept_format('json')
-        request.set_DomainName(domain)
-        request.set_RRKeyWord(rr)
-        request.set_Type(type)
+    def call(self, domain: str, action: str, **params) -> Dict:
+        """发起一次 API 调用并返回解析后的 JSON, 参数名与接口文档一致, 与异步引擎的 call 接口相同"""
+        request = self.new_request(action)
+        for name, value in params.items():
+            getattr(request, f'set_{name}')(value)
+        return json.loads(self.do_action(request, domain))
 
+    def run_steps(self, domain: str, steps: Generator[Tuple[str, Dict], Dict, Any]) -> Any:
+        """驱动 zone_records_steps / apply_steps: 依次发起产出的调用, 把响应或异常送回, 返回其结果"""
         try:
-            response = self.client.do_action_with_exception(request)
-            records = json.loads(response)['DomainRecords']['Record']
-            return records[0] if records else None
+            action, params = next(steps)
+            while True:
+                try:
+                    response = self.call(domain, action, **params)
+                except Exception as e:
+                    action, params = steps.throw(e)
+                else:
+                    action, params = steps.send(response)
+        except StopIteration as stop:
+            return stop.value
+
+    def zone_records_steps(self, domain: str) -> Generator[Tuple[str, Dict], Dict, Optional[List[Dict]]]:
+        """分页拉取整个域名的解析记录, 失败时返回 None; 只产出调用, 由 run_steps 或 run_steps_async 执行"""
+        zone_records = []
+        page_number = 1
+        try:
+            while True:
+                response = yield 'DescribeDomainRecords', {'DomainName': domain, 'PageNumber': page_number,
+                                                           'PageSize': ZONE_PAGE_SIZE}
+                records = response['DomainRecords']['Record']
+                zone_records.extend(records)
+
+                # 已拉取到最后一页
+                if not records or page_number * ZONE_PAGE_SIZE >= response.get('TotalCount', 0):
+                    break
+                page_number += 1
         except Exception as e:
-            self.logger.error(f'获取域名解析记录失败 ({domain}:{rr}): {str(e)}')
+            self.logger.error(f'获取域名解析记录失败 ({domain}): {str(e)}')
             return None
 
-    def add_domain_record(self, ip: str, domain: str, rr: str,type:str) -> bool:
-        """创建新的域名解析记录"""
-        request = AddDomainRecordRequest()
-        request.set_accept_format('json')
-        request.set_DomainName(domain)
-        request.set_RR(rr)
-        request.set_Type(type)
-        request.set_Value(ip)
+        self.zone_pages[domain] = page_number
+        self.logger.info(f'已获取域名 {domain} 的解析记录快照, 共 {len(zone_records)} 条, {page_number} 页')
+        return zone_records
+
+    def index_records(self, domain: str, records: List[Dict]) -> Dict[RecordKey, Dict]:
+        """按 (RR, Type, Line) 精确建立解析记录索引, 同一键下存在多条记录时保留第一条并记录告警"""
+        index = {}
+        duplicates = {}
+        for record in records:
+            key = (record['RR'], record['Type'], record.get('Line', DEFAULT_LINE))
+            if key in index:
+                duplicates.setdefault(key, [index[key]['RecordId']]).append(record['RecordId'])
+                continue
+            index[key] = record
+
+        for (rr, type, line), record_ids in duplicates.items():
+            self.logger.warning(
+                f'存在多条相同的解析记录 ({rr}.{domain} {type} {line}): {", ".join(record_ids)}, '
+                f'将使用 {record_ids[0]}'
+            )
+        return index
+
+    def load_zone(self, domain: str) -> Optional[Dict[RecordKey, Dict]]:
+        """拉取并索引一个域名的快照, 失败时返回 None"""
+        records = self.run_steps(domain, self.zone_records_steps(domain))
+        return self.index_records(domain, records) if records is not None else None
+
+    def load_zones(self, domains: List[str]) -> None:
+        """并发拉取涉及的域名快照"""
+        self.zone_pages = {}
+        self.zones = dict(zip(domains, self.map_by_account(self.load_zone, domains, domains)))
+
+    def diff_target(self, target: RecordTarget) -> PlanItem:
+        """将一条记录与快照比较, 得到需要执行的操作"""
+        zone = self.zones.get(target.domain)
+        if zone is None:
+            # 快照获取失败时不能判断记录是否存在, 跳过以免重复创建
+            return PlanItem('skip', target, None)
 
+        record = zone.get((target.rr, target.type, target.line))
+        if not record:
+            return PlanItem('create', target, None)
+        if record['Value'] != target.value:
+            return PlanItem('update', target, record)
+        return PlanItem('noop', target, record)
+
+    def build_plan(self, targets: List[RecordTarget]) -> List[PlanItem]:
+        """第一阶段: 拉取快照并与期望状态比较, 按域名分组, 组内先更新后创建"""
+        self.load_zones(list(dict.fromkeys(target.domain for target in targets)))
+        plan = [self.diff_target(target) for target in targets]
+        plan.sort(key=lambda item: (item.target.domain, PLAN_ORDER[item.action]))
+        return plan
+
+    def apply_steps(self, item: PlanItem) -> Generator[Tuple[str, Dict], Dict, Tuple[str, Optional[str]]]:
+        """执行计划中的一项操作, 返回 (结果, RecordId); 写操作成功后记录日志和变更日志"""
+        target, record = item.target, item.record
+        domain, subdomain, type, line, current_ip = target.domain, target.rr, target.type, target.line, target.value
+        if item.action == 'noop':
+            self.logger.debug(f'DNS记录已是最新: {target.fqdn} -> {current_ip}')
+            return 'unchanged', record['RecordId']
+
+        if item.action == 'create':
+            self.logger.info(f'未找到域名解析记录,准备创建: {target.fqdn}')
+            action, record_id, old_value = 'AddDomainRecord', None, None
+            params = {'DomainName': domain, 'RR': subdomain, 'Type': type, 'Value': current_ip, 'Line': line}
+        elif item.action == 'update':
+            action, record_id, old_value = 'UpdateDomainRecord', record['RecordId'], record['Value']
+            params = {'RecordId': record_id, 'RR': subdomain, 'Type': type, 'Value': current_ip, 'Line': line}
+        else:
+            return 'failed', None
+
+        verb = '创建' if item.action == 'create' else '更新'
         try:
-            self.client.do_action_with_exception(request)
-            self.logger.info(f'成功创建DNS记录: {rr}.{domain} -> {ip}')
-            return True
+            started = time.perf_counter()
+            response = yield action, params
+            latency = time.perf_counter() - started
+            record_id = record_id or response['RecordId']
         except Exception as e:
-            self.logger.error(f'创建DNS记录失败 ({rr}.{domain}): {str(e)}')
-            return False
+            self.logger.error(f'{verb}DNS记录失败 ({target.fqdn}): {str(e)}',
+                              extra=log_fields(action, domain, subdomain, record_id))
+            return 'failed', None
 
-    def update_domain_record(self, record_id: str, current_ip: str, domain: str, rr: str,type:str) -> bool:
-        """更新域名解析记录"""
-        request = UpdateDomainRecordRequest()
-        request.set_accept_format('json')
-        request.set_RecordId(record_id)
-        request.set_RR(rr)
-        request.set_Type(type)
-        request.set_Value(current_ip)
+        self.logger.info(f'成功{verb}DNS记录: {target.fqdn} -> {current_ip}',
+                         extra=log_fields(action, domain, subdomain, record_id, latency))
+        self.journal_change(item.action, record_id, domain, subdomain, type, line, old_value, current_ip, latency)
+        return ('created' if item.action == 'create' else 'updated'), record_id
+
+    def apply_item(self, item: PlanItem) -> Tuple[str, Optional[str]]:
+        return self.run_steps(item.target.domain, self.apply_steps(item))
 
+    def apply_plan(self, plan: List[PlanItem]) -> List[Tuple[str, Optional[str]]]:
+        """第二阶段: 并发执行计划中的写操作"""
+        return self.map_by_account(self.apply_item, plan, (item.target.domain for item in plan))
+
+    def collect_targets(self, interfaces: Optional[Set[str]], reconcile: bool, now: float,
+                        report: SyncReport) -> List[RecordTarget]:
+        """根据所有域名配置计算期望状态, 返回本地缓存无法确认的记录
+
+        记录列表和缓存键在加载配置时已展开, 这里只按配置块查询接口地址并逐条比较.
+        读不到接口地址的记录计入 report.failed, 以便 --once 返回错误、调度器按重试间隔退避.
+        """
+        targets = []
         try:
-            self.client.do_action_with_exception(request)
-            self.logger.info(f'成功更新DNS记录: {rr}.{domain} -> {current_ip}')
-            return True
-        except Exception as e:
-            self.logger.error(f'更新DNS记录失败 ({rr}.{domain}): {str(e)}')
-            return False
-
-    def sync(self) -> None:
-        """同步DNS记录"""
-        # 遍历每个接口和对应的域名列表
-        for domainInfo in self.domains:
-            current_ip = self.get_interface_ipv6(domainInfo['bind_interface'])
-            if not current_ip:
+            self.address_provider.refresh()
+        except OSError as e:
+            self.logger.error(f'读取接口地址失败: {str(e)}')
+            report.failed += sum(len(records) for zone in self.domains for _, records in zone.records
+                                 if interfaces is None or zone.interface in interfaces)
+            return targets
+
+        for zone in self.domains:
+            if interfaces is not None and zone.interface not in interfaces:
                 continue
+            # 同一个配置块可以同时发布 A 和 AAAA 记录, 共用本轮的接口扫描结果
+            for type, records in zone.records:
+                with self.interface_duration.time(zone.interface):
+                    current_ip = self.get_interface_address(zone.interface, type, zone.address_policy,
+                                                            zone.allow_private)
+                if not current_ip:
+                    report.failed += len(records)
+                    continue
+
+                report.checked += len(records)
+                for spec in records:
+                    if not reconcile and self.state.is_fresh(spec.key, current_ip, now):
+                        report.unchanged += 1
+                        continue
+                    targets.append(RecordTarget(spec.domain, spec.rr, spec.type, spec.line, current_ip, spec.key,
+                                                spec.fqdn))
+        return targets
+
+    def plan(self) -> List[PlanItem]:
+        """计算全量变更计划但不执行, 忽略本地状态缓存"""
+        with self.sync_lock:
+            self.begin_cycle()
+            targets = self.collect_targets(None, True, self.clock(), SyncReport())
+            return self.build_plan(targets)
 
-            # 遍历所有的子域名前缀
-            for subdomain in domainInfo['subdomain']:
-                record = self.get_domain_records(domainInfo['domain_name'], subdomain,domainInfo['type'])
-                if not record:
-                    self.logger.info(f'未找到域名解析记录,准备创建: {subdomain}.{domainInfo['domain_name']}')
-                    self.add_domain_record(current_ip, domainInfo['domain_name'], subdomain,domainInfo['type'])
+    def rollback(self, timestamp: float) -> Tuple[List[PlanItem], SyncReport]:
+        """按变更日志把 timestamp 之后被修改过的记录恢复到该时间点的值, 只写入与当前值不同的记录
+
+        之后才创建的记录不会被删除, 只记录警告; 域名已不在当前配置中的记录无法确定账号, 计为失败.
+        """
+        report = SyncReport()
+        if self.journal is None:
+            self.logger.error('未启用变更日志, 无法回滚')
+            report.failed += 1
+            return [], report
+
+        with self.sync_lock:
+            self.begin_cycle()
+            started = time.perf_counter()
+            targets = []
+            for record_id, domain, rr, type, line, value in self.journal.values_at(timestamp):
+                if value is None:
+                    self.logger.warning(f'解析记录 {rr}.{domain} ({type}) 在该时间点之后创建, 不自动删除')
+                    continue
+                if domain not in self.routes:
+                    # 域名已从配置中移除或改名, 无法确定所属账号和地域
+                    self.logger.error(f'解析记录 {record_fqdn(rr, domain)} ({type}) 的域名不在当前配置中, 无法回滚')
+                    report.failed += 1
                     continue
+                targets.append(RecordTarget(domain, rr, type, line, value, self.state.key(domain, rr, type, line),
+                                            record_fqdn(rr, domain)))
+                report.checked += 1
+
+            plan = self.build_plan(targets) if targets else []
+            for item, (status, record_id) in zip(plan, self.apply_plan(plan)):
+                report.record(status)
+                # 回滚后的值与接口地址不一致, 让下一轮同步重新确认
+                self.state.invalidate(item.target.key)
+            self.state.save()
+            report.duration = time.perf_counter() - started
+            self.logger.info(f'回滚完成: {report}')
+            return plan, report
+
+    def sync(self, interfaces: Optional[Set[str]] = None, blocking: bool = True) -> Optional[SyncReport]:
+        """同步DNS记录, 指定 interfaces 时只同步绑定到这些接口的域名
+
+        blocking 为 False 且已有一轮同步在运行时直接返回 None, 不排队等待.
+        """
+        if not self.sync_lock.acquire(blocking):
+            return None
+        try:
+            return self._sync(interfaces)
+        finally:
+            self.sync_lock.release()
+
+    def _sync(self, interfaces: Optional[Set[str]]) -> SyncReport:
+        self.begin_cycle()
+        started = time.perf_counter()
+        report = SyncReport()
+        connections = self.connection_stats()
+        now = self.clock()
+        # 只同步部分接口时不做全量对账
+        reconcile = interfaces is None and now - self.state.last_reconcile >= self.reconcile_interval
+        if reconcile:
+            self.logger.info('开始全量对账, 忽略本地状态缓存')
+
+        targets = self.collect_targets(interfaces, reconcile, now, report)
+        plan = self.build_plan(targets) if targets else []
+        for item, (status, record_id) in zip(plan, self.apply_plan(plan)):
+            target = item.target
+            report.record(status)
+            if status == 'unchanged' and self.record_status.get(target.key) in (None, 'failed'):
+                self.logger.info(f'DNS记录已是最新: {target.fqdn} -> {target.value}')
+            self.record_status[target.key] = status
+            if status in ('created', 'updated'):
+                self.record_last_change.set(now, target.domain, target.rr, target.type)
+            if record_id:
+                self.state.confirm(target.key, target.value, record_id, now)
+            else:
+                self.state.invalidate(target.key)
+
+        if reconcile and not report.failed:
+            self.state.mark_reconciled(now)
+        self.state.save()
+
+        report.duration = time.perf_counter() - started
+        stats = self.connection_stats()
+        report.connections_opened = stats['opened'] - connections['opened']
+        report.connections_reused = stats['reused'] - connections['reused']
+        self.sync_duration.observe(report.duration)
+        for result in ('checked', 'unchanged', 'created', 'updated', 'failed'):
+            self.records_total.inc(getattr(report, result), result)
+        self.connections_total.inc(report.connections_opened, 'opened')
+        self.connections_total.inc(report.connections_reused, 'reused')
+        self.logger.info(f'本轮同步完成: {report}')
+        return report
+
+
+class AsyncAliyunDDNS(AliyunDDNS):
+    """基于 asyncio 的同步引擎, 自行签名请求并复用一个 keep-alive 连接池, 单线程并发处理所有记录"""
+
+    def __init__(self, profiles: Dict[str, CredentialProfile], domains: Tuple[ZoneConfig, ...],
+                 settings: Optional[Settings] = None):
+        super().__init__(profiles, domains, settings)
+        # 客户端很轻量, 立即创建以便缺少 aiohttp 时在启动阶段报错
+        for profile, region in set(self.routes.values()):
+            self.clients.get(profile, region)
+        # asyncio 导入较慢, 只有选择异步后端时才加载
+        import asyncio
+        self._asyncio = asyncio
+        self.loop = asyncio.new_event_loop()
+        # Python 3.10 之前 Semaphore 在创建时绑定默认事件循环, 需要在 self.loop 中创建
+        self.semaphore = self.loop.run_until_complete(self.create_semaphore())
+
+    async def create_semaphore(self):
+        return self._asyncio.Semaphore(self.max_workers)
+
+    def create_client(self, profile: str, region: str):
+        # 签名与地域无关, 接口地址默认使用全局的 alidns.aliyuncs.com
+        from alidns_rpc import ALIDNS_ENDPOINT, AsyncAlidnsClient
+        credentials = self.profiles[profile]
+        return AsyncAlidnsClient(credentials.access_key_id, credentials.access_key_secret,
+                                 self.endpoint(profile) or ALIDNS_ENDPOINT, self.max_workers,
+                                 self.settings.api_timeout)
+
+    def connection_stats(self) -> Dict[str, int]:
+        stats = {'opened': 0, 'reused': 0}
+        for client in self.clients.values():
+            for state, count in client.connection_stats().items():
+                stats[state] += count
+        return stats
 
-                if record['Value'] != current_ip:
-                    self.update_domain_record(record['RecordId'], current_ip, domainInfo['domain_name'], subdomain,domainInfo['type'])
+    async def call(self, domain: str, action: str, **params) -> Dict:
+        """使用域名所属账号的客户端, 经过该账号的限流和全局并发限制后发起 API 请求, 临时错误按退避策略重试"""
+        profile, region = self.routes[domain]
+        limiter = self.rate_limiters[profile]
+        delay = self.retry_policy.base_delay
+        attempt = 0
+        while True:
+            attempt += 1
+            wait = limiter.reserve()
+            self.check_deadline(action, wait)
+            await self._asyncio.sleep(wait)
+            try:
+                async with self.semaphore:
+                    with self.api_duration.time(action):
+                        return await self.clients.get(profile, region).call(action, **params)
+            except Exception as e:
+                delay = self.retry_delay(action, attempt, delay, e, limiter)
+                if delay is None:
+                    raise
+                await self._asyncio.sleep(delay)
+
+    async def run_steps_async(self, domain: str, steps: Generator[Tuple[str, Dict], Dict, Any]) -> Any:
+        """与 run_steps 相同, 在事件循环中发起调用"""
+        try:
+            action, params = next(steps)
+            while True:
+                try:
+                    response = await self.call(domain, action, **params)
+                except Exception as e:
+                    action, params = steps.throw(e)
                 else:
-                    self.logger.info(f'DNS记录已是最新: {subdomain}.{domainInfo['domain_name']} -> {current_ip}')
+                    action, params = steps.send(response)
+        except StopIteration as stop:
+            return stop.value
+
+    async def load_zone_async(self, domain: str) -> Optional[Dict[RecordKey, Dict]]:
+        records = await self.run_steps_async(domain, self.zone_records_steps(domain))
+        return self.index_records(domain, records) if records is not None else None
+
+    async def apply_item_async(self, item: PlanItem) -> Tuple[str, Optional[str]]:
+        return await self.run_steps_async(item.target.domain, self.apply_steps(item))
+
+    async def load_zones_async(self, domains: List[str]) -> None:
+        self.zone_pages = {}
+        zones = await self._asyncio.gather(*(self.load_zone_async(domain) for domain in domains))
+        self.zones = dict(zip(domains, zones))
+
+    # 事件循环和连接池在多轮同步间复用, sync_lock 保证同一时间只有一个线程驱动循环
+    def load_zones(self, domains: List[str]) -> None:
+        self.loop.run_until_complete(self.load_zones_async(domains))
+
+    def apply_plan(self, plan: List[PlanItem]) -> List[Tuple[str, Optional[str]]]:
+        async def apply_all():
+            return await self._asyncio.gather(*(self.apply_item_async(item) for item in plan))
+        return self.loop.run_until_complete(apply_all())
+
+    def close_clients(self, clients: List) -> None:
+        for client in clients:
+            self.loop.run_until_complete(client.close())
+
+    def close(self) -> None:
+        super().close()
+        self.close_clients(self.clients.values())
+        self.loop.close()
+
+
+class AdaptiveScheduler:
+    """内置的自适应调度器, 替代 APScheduler 的 BlockingScheduler
+
+    检测到地址变化后缩短检查间隔, 之后每轮稳定检查间隔翻倍直到最大间隔; API 调用失败时按指数退避
+    并加入随机抖动重试. 同一时间最多只运行一轮同步 (相当于 max_instances=1), 上一轮尚未结束
+    (例如 netlink 事件触发的同步仍在等待 Alidns 响应) 时跳过本次检查.
+    """
+
+    def __init__(self, job: Callable[..., Optional[SyncReport]], interval: float = DEFAULT_UPDATE_INTERVAL,
+                 min_interval: float = DEFAULT_MIN_INTERVAL, max_interval: float = DEFAULT_MAX_INTERVAL,
+                 retry_interval: float = DEFAULT_RETRY_INTERVAL):
+        self.job = job
+        self.interval = interval
+        self.min_interval = min(min_interval, interval)
+        self.max_interval = max(max_interval, interval)
+        self.retry_interval = retry_interval
+        self.current = interval
+        self.failures = 0
+        self.stop_event = threading.Event()
+        self.logger = logging.getLogger('DDNSLogger')
+
+    def next_delay(self, report: Optional[SyncReport]) -> float:
+        """根据本轮结果计算下一次检查的等待时间, report 为 None 表示本轮失败"""
+        if report is None or report.failed:
+            self.failures += 1
+            backoff = min(self.max_interval, self.retry_interval * 2 ** (self.failures - 1))
+            # 均匀抖动, 避免多个实例在 Alidns 限流恢复后同时重试
+            return random.uniform(backoff / 2, backoff)
+
+        self.failures = 0
+        if report.created or report.updated:
+            self.current = self.min_interval
+        else:
+            self.current = min(self.max_interval, self.current * 2)
+        return self.current
+
+    def run_once(self) -> float:
+        """执行一轮同步并返回下一次检查的等待时间"""
+        try:
+            report = self.job(blocking=False)
+        except Exception as e:
+            self.logger.error(f'同步失败: {str(e)}')
+            report = None
+        else:
+            if report is None:
+                self.logger.info('上一轮同步尚未结束, 跳过本次检查')
+                return self.current
+        return self.next_delay(report)
+
+    def run(self, initial_delay: float = 0) -> None:
+        """阻塞运行, 直到调用 stop()"""
+        delay = initial_delay
+        while not self.stop_event.wait(delay):
+            delay = self.run_once()
+            self.logger.debug(f'下一次检查将在 {delay:.1f} 秒后进行')
+
+    def stop(self) -> None:
+        self.stop_event.set()
+
+
+def profile_startup(argv: List[str], limit: int = 15) -> str:
+    """在子进程中以 -X importtime 启动客户端, 按顶层包汇总导入耗时
+
+    带 --once 或 --plan 时完整执行一次, 包含按需加载的 SDK; 否则常驻模式不会退出, 只统计模块本身的导入.
+    """
+    import subprocess
+
+    module_dir = os.path.dirname(os.path.abspath(__file__))
+    if '--once' in argv or '--plan' in argv:
+        command = [sys.executable, '-X', 'importtime', os.path.join(module_dir, 'main.py'), *argv]
+    else:
+        command = [sys.executable, '-X', 'importtime', '-c', 'import main']
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [module_dir, os.environ.get('PYTHONPATH')])))
+    started = time.perf_counter()
+    result = subprocess.run(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    elapsed = time.perf_counter() - started
+
+    # 每行格式: import time: self [us] | cumulative | imported package
+    packages: Dict[str, List[int]] = {}
+    total = modules = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        fields = line[len('import time:'):].split('|')
+        self_us = int(fields[0])
+        package = fields[2].strip().split('.')[0]
+        entry = packages.setdefault(package, [0, 0])
+        entry[0] += self_us
+        entry[1] += 1
+        total += self_us
+        modules += 1
 
+    import resource
+    # Linux 上 ru_maxrss 的单位为 KB
+    peak_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    lines = [f'启动耗时 {elapsed:.3f}s, 导入 {modules} 个模块共 {total / 1000:.1f}ms, '
+             f'峰值内存 {peak_rss:.1f}MB, 退出码 {result.returncode}',
+             f'{"耗时(ms)":>10} {"占比":>6} {"模块数":>6}  包']
+    for package, (self_us, count) in sorted(packages.items(), key=lambda item: -item[1][0])[:limit]:
+        lines.append(f'{self_us / 1000:>10.1f} {self_us / max(total, 1):>6.0%} {count:>6}  {package}')
+    return '\n'.join(lines)
+
+
+def parse_timestamp(value: str) -> float:
+    """解析 Unix 时间戳或本地时间的 ISO 格式时间, 如 2024-05-01T08:00:00"""
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'无法解析的时间: {value}')
+
+
+def config_files(config_file: str) -> List[str]:
+    """配置文件、可选的本地配置文件和同目录下 conf.d/*.toml, 按加载顺序返回"""
+    files = [config_file, config_file.replace('.toml', '.local.toml')]
+    conf_dir = os.path.join(os.path.dirname(config_file), 'conf.d')
+    if os.path.isdir(conf_dir):
+        files.extend(os.path.join(conf_dir, name) for name in sorted(os.listdir(conf_dir)) if name.endswith('.toml'))
+    return files
 
 
 def load_config(logger: logging.Logger,args:argparse.Namespace) -> tuple:
-    """从TOML文件加载配置"""
+    """从TOML文件加载配置, 校验后编译为 (账号配置, 域名配置块, 运行参数)"""
     try:
         # 获取配置文件路径
         config_file = args.config
@@ -196,20 +1343,30 @@ def load_config(logger: logging.Logger,args:argparse.Namespace) -> tuple:
             logger.info(f'已加载本地配置文件: {local_config_file}')
             # 使用本地配置覆盖默认配置
             config.update(local_config)
+
+        # conf.d 中的配置片段: [[domains]] 追加到已有的域名配置后, [profiles] 按账号名合并, 其余覆盖
+        for fragment_file in config_files(config_file)[2:]:
+            fragment = toml.load(fragment_file)
+            logger.info(f'已加载配置片段: {fragment_file}')
+            config['domains'] = [*config.get('domains', []), *fragment.pop('domains', [])]
+            config['profiles'] = {**config.get('profiles', {}), **fragment.pop('profiles', {})}
+            config.update(fragment)
         
-        # 读取必需的凭证
-        credentials = config.get('credentials', {})
-        access_key_id = credentials.get('access_key_id')
-        access_key_secret = credentials.get('access_key_secret')
-        
-        if not all([access_key_id, access_key_secret]):
+        # 读取访问凭证: [credentials] 为默认账号, [profiles.<name>] 为其他命名账号
+        profiles = dict(config.get('profiles', {}))
+        if config.get('credentials'):
+            profiles.setdefault(DEFAULT_PROFILE, config['credentials'])
+        if not profiles:
             raise ValueError('未设置阿里云访问凭证')
+        profiles = compile_profiles(profiles)
         
-        # 获取域名映射关系
-        domains = config.get('domains', [])
-        if not domains:
+        # 可选的运行参数
+        settings = compile_settings(config.get('settings', {}))
+        # 获取域名映射关系, 展开为解析记录
+        if not config.get('domains'):
             raise ValueError('未设置域名映射关系')
-        return access_key_id, access_key_secret, domains # 将集合转换回列表
+        domains = compile_domains(config['domains'], profiles, settings)
+        return profiles, domains, settings
     except Exception as e:
         logger.error(f'加载配置失败: {str(e)}')
         return None, None, None
@@ -219,36 +1376,115 @@ def main():
     parser.add_argument('--running-in-systemd', action='store_true', help='Indicate if running in systemd environment')
     parser.add_argument('--config', type=str, default='config.toml',
                         help='配置文件路径 (默认: config.toml)')
+    parser.add_argument('--plan', action='store_true', help='只打印变更计划, 不执行写操作')
+    parser.add_argument('--once', action='store_true',
+                        help='只同步一轮后退出, 退出码 0 无变化 / 2 有记录变更 / 1 出错, 适合 cron 或 systemd timer')
+    parser.add_argument('--rollback', type=parse_timestamp, metavar='TIMESTAMP',
+                        help='按变更日志把解析记录恢复到指定时间点 (Unix 时间戳或 ISO 格式本地时间) 后退出')
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='统计启动时各模块的导入耗时后退出, 可与 --once 或 --plan 同时使用')
     args = parser.parse_args()
+
+    if args.profile_startup:
+        print(profile_startup([arg for arg in sys.argv[1:] if arg != '--profile-startup']))
+        return EXIT_UNCHANGED
    
     # 初始化日志记录器
     logger = setup_logger(args.running_in_systemd)
     
     # 加载配置
-    access_key_id, access_key_secret, domains = load_config(logger,args)
-    if not all([access_key_id, access_key_secret, domains]):
+    profiles, domains, settings = load_config(logger,args)
+    if not all([profiles, domains]):
         logger.error('配置加载失败')
-        return
+        return EXIT_ERROR
+    if (settings.log_retention, settings.log_repeat_window) != (DEFAULT_LOG_RETENTION, DEFAULT_LOG_REPEAT_WINDOW):
+        logger = setup_logger(args.running_in_systemd, settings.log_retention, settings.log_repeat_window)
     
-    # 创建DDNS客户端
-    ddns = AliyunDDNS(access_key_id, access_key_secret, domains)
+    # 创建DDNS客户端, backend = "async" 时使用 asyncio 引擎
+    ddns_class = AsyncAliyunDDNS if settings.backend == 'async' else AliyunDDNS
+    try:
+        ddns = ddns_class(profiles, domains, settings)
+    except (RuntimeError, ValueError) as e:
+        logger.error(str(e))
+        return EXIT_ERROR
     ddns.logger = logger
-    
-    update_interval = 300  # 5分钟更新一次
-    logger.info(f'DDNS服务已启动，每{update_interval}秒检查一次IP变化...')
-    ddns.sync()
-    # 创建调度器
-    scheduler = BlockingScheduler()
-    
-    # 添加定时任务
-    scheduler.add_job(ddns.sync, 'interval', seconds=update_interval)
-    
+
+    if args.plan:
+        print(format_plan(ddns.plan(), ddns.zone_pages))
+        ddns.close()
+        return EXIT_UNCHANGED
+
+    if args.rollback is not None:
+        try:
+            plan, report = ddns.rollback(args.rollback)
+        finally:
+            ddns.close()
+        print(format_plan(plan, ddns.zone_pages))
+        if report.failed:
+            return EXIT_ERROR
+        return EXIT_CHANGED if report.created or report.updated else EXIT_UNCHANGED
+
+    if args.once:
+        try:
+            report = ddns.sync()
+        except Exception as e:
+            logger.error(f'同步失败: {str(e)}')
+            return EXIT_ERROR
+        finally:
+            ddns.close()
+        if report.failed:
+            return EXIT_ERROR
+        return EXIT_CHANGED if report.created or report.updated else EXIT_UNCHANGED
+
+    # 可选的 Prometheus 指标接口
+    if settings.metrics_listen:
+        from metrics_server import start_metrics_server
+        start_metrics_server(ddns.metrics, settings.metrics_listen)
+
+    scheduler = AdaptiveScheduler(ddns.sync, settings.update_interval, settings.min_interval, settings.max_interval,
+                                  settings.retry_interval)
+    logger.info(f'DDNS服务已启动，每{scheduler.min_interval}-{scheduler.max_interval}秒检查一次IP变化...')
+
+    # 监听接口地址变更事件, 定时检查作为兜底
+    watcher = None
+    if settings.netlink_watch:
+        try:
+            watcher = NetlinkWatcher({zone.interface for zone in domains}, ddns.sync, settings.netlink_debounce)
+            watcher.start()
+            logger.info('已启用 netlink 地址变更监听')
+        except (OSError, AttributeError) as e:
+            # 非 Linux 平台没有 AF_NETLINK
+            logger.warning(f'无法启用 netlink 地址变更监听: {str(e)}')
+
+    def reload_config() -> None:
+        """重新加载配置, 只立即同步新增或修改过的域名配置块绑定的接口"""
+        new_profiles, new_domains, new_settings = load_config(logger, args)
+        if not all([new_profiles, new_domains]):
+            logger.error('配置无效, 继续使用当前配置')
+            return
+        if new_settings != settings:
+            logger.warning('[settings] 的修改需要重启服务后生效')
+        interfaces = ddns.reload(new_profiles, new_domains)
+        if watcher is not None:
+            watcher.interfaces = {zone.interface for zone in new_domains}
+        if interfaces:
+            ddns.sync(interfaces)
+
+    # 监听配置文件修改, 无需重启即可增删域名配置
+    if settings.config_watch_interval:
+        ConfigWatcher(args.config, reload_config, settings.config_watch_interval).start()
+
+    # systemd 停止服务时发送 SIGTERM
+    signal.signal(signal.SIGTERM, lambda signum, frame: scheduler.stop())
     try:
-        # 启动调度器
-        scheduler.start()
+        # 立即执行第一轮同步, 之后按自适应间隔检查
+        scheduler.run()
     except (KeyboardInterrupt, SystemExit):
-        scheduler.shutdown()
+        pass
+    finally:
+        ddns.close()
         logger.info('DDNS服务已停止')
+    return EXIT_UNCHANGED
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""轻量的指标采集与 Prometheus 文本格式渲染, 只依赖标准库; HTTP 导出见 metrics_server"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+# 默认直方图分桶(秒), 覆盖本地调用到慢速 API 调用
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def escape_label_value(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{escape_label_value(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """指标基类, 按标签值分组保存样本"""
+
+    type = 'untyped'
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+
+    def _check(self, labels: LabelValues) -> LabelValues:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f'{self.name} 需要标签 {self.labelnames}, 实际为 {labels}')
+        return tuple(str(v) for v in labels)
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.type}']
+        lines.extend(self.samples())
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self.values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, *labels: str) -> None:
+        key = self._check(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, *labels: str) -> float:
+        return self.values.get(self._check(labels), 0)
+
+    def samples(self) -> Iterator[str]:
+        with self.lock:
+            items = sorted(self.values.items())
+        for labels, value in items:
+            yield f'{self.name}{format_labels(self.labelnames, labels)} {format_value(value)}'
+
+
+class Gauge(Counter):
+    type = 'gauge'
+
+    def set(self, value: float, *labels: str) -> None:
+        key = self._check(labels)
+        with self.lock:
+            self.values[key] = value
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 标签值 -> [各分桶计数, 总和, 总数]
+        self.values: Dict[LabelValues, List] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        key = self._check(labels)
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def count(self, *labels: str) -> int:
+        entry = self.values.get(self._check(labels))
+        return entry[2] if entry else 0
+
+    def samples(self) -> Iterator[str]:
+        with self.lock:
+            items = sorted((labels, ([*counts], total, count)) for labels, (counts, total, count) in self.values.items())
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = format_labels(self.labelnames, labels, f'le="{format_value(bound)}"')
+                yield f'{self.name}_bucket{le} {cumulative}'
+            le = format_labels(self.labelnames, labels, 'le="+Inf"')
+            yield f'{self.name}_bucket{le} {count}'
+            yield f'{self.name}_sum{format_labels(self.labelnames, labels)} {format_value(total)}'
+            yield f'{self.name}_count{format_labels(self.labelnames, labels)} {count}'
+
+
+class MetricsRegistry:
+    """指标注册表, 负责整体导出"""
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self.metrics:
+            raise ValueError(f'指标已存在: {metric.name}')
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def render(self) -> str:
+        return '\n'.join(metric.render() for metric in self.metrics.values()) + '\n'
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""通过 HTTP 提供 Prometheus /metrics 接口, 只在配置了 metrics_listen 时才导入"""
+
+import logging
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from metrics import MetricsRegistry
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        data = self.server.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', PROMETHEUS_CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MetricsServer(ThreadingHTTPServer):
+    """在后台线程中提供 /metrics 接口"""
+
+    daemon_threads = True
+
+    def __init__(self, registry: MetricsRegistry, host: str = '127.0.0.1', port: int = 9108):
+        if ':' in host:
+            self.address_family = socket.AF_INET6
+        super().__init__((host, port), MetricsHandler)
+        self.registry = registry
+
+    def start(self) -> threading.Thread:
+        thread = threading.Thread(target=self.serve_forever, name='metrics-server', daemon=True)
+        thread.start()
+        return thread
+
+
+def start_metrics_server(registry: MetricsRegistry, listen: str) -> Optional[MetricsServer]:
+    """按 host:port 启动指标服务, 失败时记录错误并返回 None"""
+    logger = logging.getLogger('DDNSLogger')
+    host, _, port = listen.rpartition(':')
+    try:
+        server = MetricsServer(registry, host.strip('[]') or '127.0.0.1', int(port))
+    except (OSError, ValueError) as e:
+        logger.error(f'启动指标服务失败 ({listen}): {str(e)}')
+        return None
+    server.start()
+    logger.info(f'指标服务已启动: http://{listen}/metrics')
+    return server
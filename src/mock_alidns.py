@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""本地模拟的 Alidns RPC 服务, 用于离线测试 DDNS 客户端
+
+实现 DescribeDomainRecords、AddDomainRecord 和 UpdateDomainRecord 三个接口,
+记录只保存在内存中. 可以注入响应延迟、限流和随机错误, 用于验证重试逻辑和压测.
+可以直接运行: python src/mock_alidns.py --port 8053 --latency 0.05 --qps 20
+"""
+
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from alidns_rpc import compose_string_to_sign, compute_signature
+
+
+class MockAlidnsState:
+    """模拟服务的内存状态"""
+
+    def __init__(self, access_key_secret: Optional[str] = None, latency: float = 0.0, jitter: float = 0.0,
+                 qps: float = 0.0, error_rate: float = 0.0, seed: Optional[int] = None):
+        # 为 None 时不校验签名
+        self.access_key_secret = access_key_secret
+        # 故障注入: 每次响应的延迟及其随机抖动(秒), 每秒最多处理的请求数 (超出时返回 Throttling.User),
+        # 以及返回 ServiceUnavailable 的概率; 为 0 时不注入
+        self.latency = latency
+        self.jitter = jitter
+        self.qps = qps
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.records: List[Dict] = []
+        # RecordId -> 记录, 以及 (域名, RR, 类型, 线路, 值) 集合, 大量记录时避免线性查找
+        self.by_id: Dict[str, Dict] = {}
+        self.keys = set()
+        self.calls: List[str] = []
+        self.throttled = 0
+        self.errors = 0
+        self.lock = threading.Lock()
+        self._ids = itertools.count(100000)
+        self._window = (0, 0)
+
+    def add_record(self, domain: str, rr: str, type: str, value: str, line: str = 'default') -> Dict:
+        record = {
+            'RecordId': str(next(self._ids)),
+            'DomainName': domain,
+            'RR': rr,
+            'Type': type,
+            'Value': value,
+            'Line': line,
+            'TTL': 600,
+            'Status': 'ENABLE',
+            'Locked': False,
+        }
+        self.records.append(record)
+        self.by_id[record['RecordId']] = record
+        self.keys.add(record_key(record))
+        return record
+
+    def delay(self) -> float:
+        """本次响应需要等待的时间, 在处理请求的线程中等待, 不占用状态锁"""
+        if not self.latency and not self.jitter:
+            return 0.0
+        with self.lock:
+            return max(self.latency + self.random.uniform(-self.jitter, self.jitter), 0.0)
+
+    def inject_fault(self) -> Optional[Tuple[int, Dict]]:
+        """按配置返回限流或服务端错误, 调用时需持有锁"""
+        if self.qps:
+            # 按整秒窗口计数, 与服务端的流控方式类似
+            second, count = self._window
+            now = int(time.monotonic())
+            count = count + 1 if now == second else 1
+            self._window = (now, count)
+            if count > self.qps:
+                self.throttled += 1
+                return 400, error('Throttling.User', 'Request was denied due to user flow control.')
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.errors += 1
+            return 503, error('ServiceUnavailable', 'The request has failed due to a temporary failure of the server.')
+        return None
+
+    def handle(self, params: Dict[str, str], method: str = 'GET') -> Tuple[int, Dict]:
+        """处理一次调用, 返回 (HTTP 状态码, 响应体)"""
+        action = params.get('Action', '')
+        with self.lock:
+            self.calls.append(action)
+            fault = self.inject_fault()
+            if fault is not None:
+                return fault
+            if self.access_key_secret is not None:
+                unsigned = {k: v for k, v in params.items() if k != 'Signature'}
+                if compute_signature(unsigned, self.access_key_secret, method) != params.get('Signature'):
+                    # 与真实服务一致, 在错误信息中返回服务端的待签名字符串
+                    return 400, error('SignatureDoesNotMatch',
+                                      'Specified signature is not matched with our calculation. '
+                                      f'server string to sign is:{compose_string_to_sign(unsigned, method)}')
+
+            handler = getattr(self, f'action_{action}', None)
+            if handler is None:
+                return 404, error('InvalidAction.NotFound', f'Specified api {action} is not found.')
+            return handler(params)
+
+    def action_DescribeDomainRecords(self, params: Dict[str, str]) -> Tuple[int, Dict]:
+        records = [r for r in self.records if r['DomainName'] == params.get('DomainName')]
+        if 'RRKeyWord' in params:
+            records = [r for r in records if params['RRKeyWord'] in r['RR']]
+        if 'Type' in params:
+            records = [r for r in records if r['Type'] == params['Type']]
+        page_number = int(params.get('PageNumber', 1))
+        page_size = int(params.get('PageSize', 20))
+        page = records[(page_number - 1) * page_size:page_number * page_size]
+        return 200, {
+            'RequestId': request_id(),
+            'TotalCount': len(records),
+            'PageNumber': page_number,
+            'PageSize': page_size,
+            'DomainRecords': {'Record': [dict(r) for r in page]},
+        }
+
+    def action_AddDomainRecord(self, params: Dict[str, str]) -> Tuple[int, Dict]:
+        if (params.get('DomainName'), params.get('RR'), params.get('Type'), params.get('Line', 'default'),
+                params.get('Value')) in self.keys:
+            return 400, error('DomainRecordDuplicate', 'The DNS record already exists.')
+        record = self.add_record(params['DomainName'], params['RR'], params['Type'], params['Value'],
+                                 params.get('Line', 'default'))
+        return 200, {'RequestId': request_id(), 'RecordId': record['RecordId']}
+
+    def action_UpdateDomainRecord(self, params: Dict[str, str]) -> Tuple[int, Dict]:
+        r = self.by_id.get(params.get('RecordId'))
+        if r is None:
+            return 400, error('InvalidRecordId.NotFound', 'The record id does not exist.')
+        if (r['RR'], r['Type'], r['Value']) == (params.get('RR'), params.get('Type'), params.get('Value')):
+            return 400, error('DomainRecordDuplicate', 'The DNS record already exists.')
+        self.keys.discard(record_key(r))
+        r.update(RR=params['RR'], Type=params['Type'], Value=params['Value'], Line=params.get('Line', r['Line']))
+        self.keys.add(record_key(r))
+        return 200, {'RequestId': request_id(), 'RecordId': r['RecordId']}
+
+
+def record_key(record: Dict) -> Tuple[str, str, str, str, str]:
+    return record['DomainName'], record['RR'], record['Type'], record['Line'], record['Value']
+
+
+def request_id() -> str:
+    return str(uuid.uuid4()).upper()
+
+
+def error(code: str, message: str) -> Dict:
+    return {'RequestId': request_id(), 'Code': code, 'Message': message}
+
+
+class MockAlidnsHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # 响应头和响应体分两次写出, 关闭 Nagle 算法以免在 keep-alive 连接上与延迟确认叠加出约 40ms 的等待
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.respond(dict(parse_qsl(urlsplit(self.path).query, keep_blank_values=True)))
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        params = dict(parse_qsl(urlsplit(self.path).query, keep_blank_values=True))
+        params.update(parse_qsl(self.rfile.read(length).decode('utf-8'), keep_blank_values=True))
+        self.respond(params)
+
+    def respond(self, params: Dict[str, str]) -> None:
+        delay = self.server.state.delay()
+        if delay:
+            time.sleep(delay)
+        status, body = self.server.state.handle(params, self.command)
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json;charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockAlidnsServer(ThreadingHTTPServer):
+    """在后台线程中运行的模拟服务"""
+
+    daemon_threads = True
+    # 压测时客户端会同时建立多个连接
+    request_queue_size = 128
+
+    def __init__(self, state: Optional[MockAlidnsState] = None, host: str = '127.0.0.1', port: int = 0):
+        super().__init__((host, port), MockAlidnsHandler)
+        self.state = state or MockAlidnsState()
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    def start(self) -> threading.Thread:
+        thread = threading.Thread(target=self.serve_forever, name='mock-alidns', daemon=True)
+        thread.start()
+        return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地模拟 Alidns 服务')
+    parser.add_argument('--host', type=str, default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8053)
+    parser.add_argument('--access-key-secret', type=str, default=None, help='设置后校验请求签名')
+    parser.add_argument('--latency', type=float, default=0.0, help='每次响应的延迟(秒)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='响应延迟的随机抖动(秒)')
+    parser.add_argument('--qps', type=float, default=0.0, help='每秒最多处理的请求数, 超出时返回 Throttling.User')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='返回 ServiceUnavailable 的概率')
+    args = parser.parse_args()
+
+    state = MockAlidnsState(args.access_key_secret, args.latency, args.jitter, args.qps, args.error_rate)
+    server = MockAlidnsServer(state, args.host, args.port)
+    print(f'模拟 Alidns 服务已启动: {server.endpoint}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
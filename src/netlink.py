@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""rtnetlink 消息解析和接口地址变更事件的订阅"""
+
+import logging
+import select
+import socket
+import struct
+import threading
+import time
+from typing import Callable, Dict, Iterable, Set
+
+# 收到地址变更事件后等待后续事件合并的时间(秒)
+DEFAULT_NETLINK_DEBOUNCE = 0.2
+
+# rtnetlink 常量, 见 linux/rtnetlink.h
+RTMGRP_IPV4_IFADDR = 0x10
+RTMGRP_IPV6_IFADDR = 0x100
+RTM_NEWADDR = 20
+RTM_DELADDR = 21
+RTM_GETADDR = 22
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+NLM_F_REQUEST = 0x1
+NLM_F_DUMP = 0x300
+IFA_ADDRESS = 1
+IFA_LOCAL = 2
+IFA_CACHEINFO = 6
+IFA_FLAGS = 8
+# struct rtattr: len, type
+RTATTR = struct.Struct('=HH')
+# struct ifa_cacheinfo: preferred, valid, cstamp, tstamp
+IFA_CACHEINFO_STRUCT = struct.Struct('=IIII')
+
+# 地址标志, 见 linux/if_addr.h; IPv4 地址的 0x01 表示次要地址
+IFA_F_SECONDARY = 0x01
+IFA_F_TEMPORARY = 0x01
+IFA_F_DADFAILED = 0x08
+IFA_F_DEPRECATED = 0x20
+IFA_F_TENTATIVE = 0x40
+IFA_F_PERMANENT = 0x80
+IFA_F_MANAGETEMPADDR = 0x100
+# struct nlmsghdr: len, type, flags, seq, pid
+NLMSG_HEADER = struct.Struct('=IHHII')
+# struct ifaddrmsg: family, prefixlen, flags, scope, index
+IFADDRMSG = struct.Struct('=BBBBI')
+
+
+def iter_netlink_messages(data: bytes):
+    """逐条解析 netlink 数据包, 产出 (消息类型, 消息体)"""
+    offset = 0
+    while offset + NLMSG_HEADER.size <= len(data):
+        length, msg_type, _, _, _ = NLMSG_HEADER.unpack_from(data, offset)
+        if length < NLMSG_HEADER.size:
+            break
+        yield msg_type, data[offset + NLMSG_HEADER.size:offset + length]
+        # 消息按 4 字节对齐
+        offset += (length + 3) & ~3
+
+
+def parse_rtattrs(data: bytes) -> Dict[int, bytes]:
+    """解析消息体中的 rtattr 属性"""
+    attrs = {}
+    offset = 0
+    while offset + RTATTR.size <= len(data):
+        length, attr_type = RTATTR.unpack_from(data, offset)
+        if length < RTATTR.size:
+            break
+        attrs[attr_type] = data[offset + RTATTR.size:offset + length]
+        offset += (length + 3) & ~3
+    return attrs
+
+
+class NetlinkWatcher:
+    """订阅 rtnetlink 地址变更事件 (RTM_NEWADDR/RTM_DELADDR), 在绑定接口地址变化时回调"""
+
+    def __init__(self, interfaces: Iterable[str], callback: Callable[[Set[str]], None],
+                 debounce: float = DEFAULT_NETLINK_DEBOUNCE):
+        self.interfaces = set(interfaces)
+        self.callback = callback
+        self.debounce = debounce
+        self.logger = logging.getLogger('DDNSLogger')
+        self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+        self.sock.bind((0, RTMGRP_IPV4_IFADDR | RTMGRP_IPV6_IFADDR))
+
+    def parse(self, data: bytes) -> Set[str]:
+        """解析一个 netlink 数据包, 返回地址发生变化的接口名"""
+        changed = set()
+        for msg_type, payload in iter_netlink_messages(data):
+            if msg_type in (RTM_NEWADDR, RTM_DELADDR):
+                _, _, _, _, index = IFADDRMSG.unpack_from(payload)
+                try:
+                    changed.add(socket.if_indextoname(index))
+                except OSError:
+                    # 接口已被删除
+                    pass
+        return changed
+
+    def run(self) -> None:
+        """阻塞读取事件, 在 debounce 时间内合并同一批变更后触发一次回调"""
+        while True:
+            try:
+                changed = self.parse(self.sock.recv(65536))
+                while select.select([self.sock], [], [], self.debounce)[0]:
+                    changed |= self.parse(self.sock.recv(65536))
+            except OSError as e:
+                self.logger.error(f'读取 netlink 事件失败: {str(e)}')
+                time.sleep(1)
+                continue
+
+            changed &= self.interfaces
+            if changed:
+                self.logger.info(f'检测到接口地址变化: {", ".join(sorted(changed))}')
+                try:
+                    self.callback(changed)
+                except Exception as e:
+                    self.logger.error(f'处理接口地址变化失败: {str(e)}')
+
+    def start(self) -> threading.Thread:
+        thread = threading.Thread(target=self.run, name='netlink-watcher', daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""按录制的接口地址时间线回放同步过程, 比较不同调度策略产生的 API 调用数和 DNS 滞后
+
+时间线为 ScriptedAddressProvider 使用的 JSON 文件; 不指定时生成一周的模拟数据 (运营商每天更换一次前缀,
+时间随机). 回放使用模拟时钟驱动调度、本地状态缓存和对账, API 调用发往本地模拟服务, 一周的时间线
+通常几秒内完成:
+    python src/replay.py --timeline week.json --strategy fixed:300 --strategy adaptive --strategy event
+
+策略:
+    fixed:<秒>  固定间隔检查
+    adaptive    内置的自适应调度器 (AdaptiveScheduler), 参数取自 --interval/--min-interval/--max-interval
+    event       模拟 netlink 监听: 地址变化后经过 --debounce 秒立即同步, 并以 --interval 定时兜底
+"""
+
+import argparse
+import bisect
+import json
+import logging
+import random
+import statistics
+import tempfile
+import os
+from typing import Dict, List, Optional, Tuple
+
+from addresses import ScriptedAddressProvider, select_ipv6_address
+from main import (DEFAULT_MAX_INTERVAL, DEFAULT_MIN_INTERVAL, DEFAULT_RETRY_INTERVAL, DEFAULT_UPDATE_INTERVAL,
+                  AdaptiveScheduler, AliyunDDNS, SyncReport, compile_domains, compile_profiles, compile_settings)
+from mock_alidns import MockAlidnsServer, MockAlidnsState
+from netlink import DEFAULT_NETLINK_DEBOUNCE
+
+REPLAY_DOMAIN = 'example.com'
+WEEK = 7 * 86400
+
+Event = Tuple[float, str, List[str]]
+
+
+def generate_week(interface: str = 'eth0', seed: int = 0) -> List[Event]:
+    """生成一周的模拟时间线: 每天在随机时间更换一次前缀, 偶尔在同一天内再次重拨"""
+    rng = random.Random(seed)
+    events = [(0.0, interface, ['2408:8000:0:1::1/64'])]
+    for day in range(7):
+        changes = 2 if rng.random() < 0.2 else 1
+        for at in sorted(day * 86400 + rng.uniform(0, 86400) for _ in range(changes)):
+            prefix = f'2408:8{rng.randrange(0x1000):03x}:{rng.randrange(0x10000):x}:{rng.randrange(0x10000):x}'
+            events.append((at, interface, [f'{prefix}::1/64']))
+    return sorted(events)
+
+
+def load_timeline(path: str) -> List[Event]:
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return sorted((event['at'], event['interface'], event['addresses']) for event in data['events'])
+
+
+class FixedStrategy:
+    def __init__(self, interval: float):
+        self.name = f'fixed:{interval:g}'
+        self.interval = interval
+
+    def next_check(self, now: float, report: SyncReport) -> float:
+        return now + self.interval
+
+
+class AdaptiveStrategy:
+    def __init__(self, args: argparse.Namespace):
+        self.name = 'adaptive'
+        self.scheduler = AdaptiveScheduler(None, args.interval, args.min_interval, args.max_interval,
+                                           args.retry_interval)
+
+    def next_check(self, now: float, report: SyncReport) -> float:
+        return now + self.scheduler.next_delay(report)
+
+
+class EventStrategy:
+    def __init__(self, args: argparse.Namespace, events: List[Event]):
+        self.name = 'event'
+        self.interval = args.interval
+        self.debounce = args.debounce
+        self.change_times = sorted(at + args.debounce for at, _, _ in events)
+
+    def next_check(self, now: float, report: SyncReport) -> float:
+        index = bisect.bisect_right(self.change_times, now)
+        next_change = self.change_times[index] if index < len(self.change_times) else float('inf')
+        return min(now + self.interval, next_change)
+
+
+def create_strategy(spec: str, args: argparse.Namespace, events: List[Event]):
+    if spec.startswith('fixed:'):
+        return FixedStrategy(float(spec.partition(':')[2]))
+    if spec == 'adaptive':
+        return AdaptiveStrategy(args)
+    if spec == 'event':
+        return EventStrategy(args, events)
+    raise ValueError(f'未知的调度策略: {spec}')
+
+
+def replay(strategy, events: List[Event], duration: float, args: argparse.Namespace) -> Dict:
+    """用模拟时钟回放一遍时间线, 返回 API 调用数和每次地址变化的 DNS 滞后"""
+    interfaces = sorted({interface for _, interface, _ in events})
+    subdomains = {interface: [f'host{i}.{interface}' for i in range(args.records)] for interface in interfaces}
+    state = MockAlidnsState('secret')
+    server = MockAlidnsServer(state)
+    server.start()
+
+    clock = [0.0]
+    with tempfile.TemporaryDirectory() as workdir:
+        settings = compile_settings({
+            'endpoint': server.endpoint,
+            'api_protocol': 'http',
+            'api_qps': 0,
+            'state_file': os.path.join(workdir, 'state.json'),
+            'journal_file': '',
+            'state_ttl': args.state_ttl,
+            'reconcile_interval': args.reconcile_interval,
+        })
+        profiles = compile_profiles({'default': {'access_key_id': 'replay', 'access_key_secret': 'secret'}})
+        domains = compile_domains([{'domain_name': REPLAY_DOMAIN, 'bind_interface': interface, 'type': 'AAAA',
+                                    'subdomain': subdomains[interface]} for interface in interfaces], profiles, settings)
+        ddns = AliyunDDNS(profiles, domains, settings)
+        ddns.clock = lambda: clock[0]
+        provider = ddns.address_provider = ScriptedAddressProvider(events, lambda: clock[0])
+
+        # 尚未在 DNS 中生效的地址变化: 接口 -> 变化时间列表
+        pending: Dict[str, List[float]] = {interface: [] for interface in interfaces}
+        lags: List[float] = []
+        syncs = 0
+        event_index = 0
+        now = 0.0
+        while now <= duration:
+            while event_index < len(events) and events[event_index][0] <= now:
+                at, interface, _ = events[event_index]
+                pending[interface].append(at)
+                event_index += 1
+            clock[0] = now
+            report = ddns.sync()
+            syncs += 1
+
+            published = {(record['RR'], record['Value']) for record in state.records}
+            for interface in interfaces:
+                if not pending[interface]:
+                    continue
+                expected = select_ipv6_address(provider.addresses(interface) or [])
+                if all((rr, expected) in published for rr in subdomains[interface]):
+                    lags.extend(now - at for at in pending[interface])
+                    pending[interface] = []
+            now = strategy.next_check(now, report)
+        ddns.close()
+
+    server.shutdown()
+    reads = state.calls.count('DescribeDomainRecords')
+    return {
+        'strategy': strategy.name,
+        'syncs': syncs,
+        'reads': reads,
+        'writes': len(state.calls) - reads,
+        'changes': len(lags) + sum(len(times) for times in pending.values()),
+        'unresolved': sum(len(times) for times in pending.values()),
+        'lag_mean': statistics.mean(lags) if lags else 0.0,
+        'lag_p95': percentile(lags, 0.95),
+        'lag_max': max(lags, default=0.0),
+    }
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def format_results(results: List[Dict]) -> str:
+    lines = [f'{"策略":<14} {"同步次数":>8} {"读取":>6} {"写入":>6} {"地址变化":>8} {"未生效":>6} '
+             f'{"平均滞后(s)":>11} {"P95滞后(s)":>11} {"最大滞后(s)":>11}']
+    for r in results:
+        lines.append(f'{r["strategy"]:<14} {r["syncs"]:>8} {r["reads"]:>6} {r["writes"]:>6} {r["changes"]:>8} '
+                     f'{r["unresolved"]:>6} {r["lag_mean"]:>11.1f} {r["lag_p95"]:>11.1f} {r["lag_max"]:>11.1f}')
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='按地址变化时间线回放, 比较调度策略')
+    parser.add_argument('--timeline', type=str, help='时间线 JSON 文件, 不指定时生成一周的模拟数据')
+    parser.add_argument('--seed', type=int, default=0, help='生成模拟时间线的随机种子')
+    parser.add_argument('--duration', type=float, help='回放时长(秒), 默认到最后一个事件后一天, 至少一周')
+    parser.add_argument('--strategy', action='append', help='调度策略, 可重复指定')
+    parser.add_argument('--records', type=int, default=2, help='每个接口绑定的解析记录数')
+    parser.add_argument('--interval', type=float, default=DEFAULT_UPDATE_INTERVAL)
+    parser.add_argument('--min-interval', type=float, default=DEFAULT_MIN_INTERVAL)
+    parser.add_argument('--max-interval', type=float, default=DEFAULT_MAX_INTERVAL)
+    parser.add_argument('--retry-interval', type=float, default=DEFAULT_RETRY_INTERVAL)
+    parser.add_argument('--debounce', type=float, default=DEFAULT_NETLINK_DEBOUNCE)
+    parser.add_argument('--state-ttl', type=float, default=3600)
+    parser.add_argument('--reconcile-interval', type=float, default=86400)
+    parser.add_argument('--json', action='store_true', help='以 JSON 输出结果')
+    args = parser.parse_args()
+
+    logging.getLogger('DDNSLogger').setLevel(logging.WARNING)
+
+    events = load_timeline(args.timeline) if args.timeline else generate_week(seed=args.seed)
+    duration: Optional[float] = args.duration
+    if duration is None:
+        duration = max(WEEK, events[-1][0] + 86400)
+    specs = args.strategy or [f'fixed:{args.interval:g}', 'adaptive', 'event']
+    results = [replay(create_strategy(spec, args, events), events, duration, args) for spec in specs]
+    print(json.dumps(results, indent=2) if args.json else format_results(results))
+
+
+if __name__ == '__main__':
+    main()
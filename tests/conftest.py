@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from mock_alidns import MockAlidnsServer, MockAlidnsState
+
+
+@pytest.fixture
+def mock():
+    """本地模拟的 Alidns 服务, 校验签名, 访问密钥为 secret"""
+    server = MockAlidnsServer(MockAlidnsState('secret'))
+    server.start()
+    yield server
+    server.shutdown()
@@ -0,0 +1,102 @@
+from addresses import InterfaceAddress, ProcInet6Provider, select_ipv4_address, select_ipv6_address
+from netlink import (IFA_F_DEPRECATED, IFA_F_MANAGETEMPADDR, IFA_F_PERMANENT, IFA_F_SECONDARY, IFA_F_TEMPORARY,
+                     IFA_F_TENTATIVE)
+
+
+def addr(address: str, flags: int = IFA_F_PERMANENT, preferred_lft=None) -> InterfaceAddress:
+    return InterfaceAddress(address, 64, 0, flags, preferred_lft)
+
+
+def test_ula_rejected_unless_allow_private():
+    # 回归: 旧实现按字符串前缀过滤, fd 开头的 ULA 地址需要单独排除
+    addresses = [addr('fd12:3456::1'), addr('fc00::1'), addr('fe80::1')]
+    assert select_ipv6_address(addresses) is None
+    assert select_ipv6_address(addresses, allow_private=True) == 'fc00::1'
+
+
+def test_non_global_and_transition_addresses_rejected():
+    addresses = [addr('::1'), addr('2001:db8::1'), addr('2002:c000:204::1'), addr('3ffe::1')]
+    assert select_ipv6_address(addresses) is None
+
+
+def test_tentative_address_skipped():
+    addresses = [addr('2408:8000::1', IFA_F_PERMANENT | IFA_F_TENTATIVE), addr('2408:8000::2')]
+    assert select_ipv6_address(addresses) == '2408:8000::2'
+
+
+def test_stable_policy_prefers_manual_over_slaac_over_temporary():
+    temporary = addr('2408:8000::abcd', IFA_F_TEMPORARY, 3600)
+    slaac = addr('2408:8000::ffff', IFA_F_MANAGETEMPADDR, 3600)
+    manual = addr('2408:8000::9')
+    assert select_ipv6_address([temporary, slaac, manual], 'stable') == '2408:8000::9'
+    assert select_ipv6_address([temporary, slaac], 'stable') == '2408:8000::ffff'
+    assert select_ipv6_address([temporary], 'stable') == '2408:8000::abcd'
+
+
+def test_temporary_policy_prefers_longest_preferred_lifetime():
+    addresses = [
+        addr('2408:8000::9'),
+        addr('2408:8000::1', IFA_F_TEMPORARY, 600),
+        addr('2408:8000::2', IFA_F_TEMPORARY, 86400),
+    ]
+    assert select_ipv6_address(addresses, 'temporary') == '2408:8000::2'
+    assert select_ipv6_address(addresses[:1], 'temporary') == '2408:8000::9'
+
+
+def test_deprecated_address_ranked_last():
+    addresses = [addr('2408:8000::1', IFA_F_PERMANENT | IFA_F_DEPRECATED), addr('2408:8000::2', IFA_F_TEMPORARY, 0),
+                 addr('2408:8000::3', IFA_F_TEMPORARY, 600)]
+    assert select_ipv6_address(addresses, 'stable') == '2408:8000::3'
+
+
+def test_selection_is_deterministic():
+    addresses = [addr('2408:8000::20'), addr('2408:8000::3'), addr('2408:8000::100')]
+    assert select_ipv6_address(addresses) == select_ipv6_address(addresses[::-1]) == '2408:8000::3'
+
+
+def test_ipv4_prefers_primary_global_address():
+    addresses = [InterfaceAddress('192.168.1.2', 24, 0, 0), InterfaceAddress('203.0.113.9', 24, 0, 0),
+                 InterfaceAddress('8.8.4.4', 24, 0, IFA_F_SECONDARY), InterfaceAddress('1.1.1.1', 24, 0, 0)]
+    assert select_ipv4_address(addresses) == '1.1.1.1'
+    assert select_ipv4_address(addresses[:1]) is None
+    assert select_ipv4_address(addresses[:1], allow_private=True) == '192.168.1.2'
+
+
+IF_INET6 = (
+    '24088000000000000000000000000001 02 40 00 80     eth0\n'
+    '2408800000000000021122fffe334455 02 40 00 100     eth0\n'
+    'fe800000000000000211223344556677 02 40 20 80     eth0\n'
+    '00000000000000000000000000000001 01 80 10 80       lo\n'
+)
+
+
+def test_proc_inet6_parsing(tmp_path):
+    path = tmp_path / 'if_inet6'
+    path.write_text(IF_INET6)
+    provider = ProcInet6Provider(str(path))
+    assert provider.refresh()
+    assert provider.addresses('eth0') == [
+        InterfaceAddress('2408:8000::1', 64, 0, IFA_F_PERMANENT),
+        InterfaceAddress('2408:8000::211:22ff:fe33:4455', 64, 0, IFA_F_MANAGETEMPADDR),
+        InterfaceAddress('fe80::211:2233:4455:6677', 64, 0x20, IFA_F_PERMANENT),
+    ]
+    assert provider.addresses('lo') == [InterfaceAddress('::1', 128, 0x10, IFA_F_PERMANENT)]
+    assert provider.addresses('no-such-interface0') is None
+    # 存在但没有 IPv6 地址的接口不出现在地址表中
+    path.write_text(IF_INET6.splitlines(True)[0])
+    assert provider.refresh()
+    assert provider.addresses('lo') == []
+
+
+def test_proc_inet6_skips_unchanged_content(tmp_path):
+    path = tmp_path / 'if_inet6'
+    path.write_text(IF_INET6)
+    provider = ProcInet6Provider(str(path))
+    assert provider.refresh()
+    index = provider.index
+    assert not provider.refresh()
+    assert provider.index is index
+
+    path.write_text(IF_INET6.replace('24088000000000000000000000000001', '24088000000000000000000000000002'))
+    assert provider.refresh()
+    assert provider.addresses('eth0')[0].address == '2408:8000::2'
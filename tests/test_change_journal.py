@@ -0,0 +1,33 @@
+import pytest
+
+from change_journal import ChangeJournal
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = ChangeJournal(str(tmp_path / 'journal.sqlite3'))
+    journal.append('create', '1', 'example.com', 'www', 'AAAA', 'default', None, '2408::a', 0.01, ts=10)
+    journal.append('update', '1', 'example.com', 'www', 'AAAA', 'default', '2408::a', '2408::b', 0.01, ts=20)
+    journal.append('create', '2', 'example.com', 'api', 'AAAA', 'default', None, '2408::b', 0.01, ts=25)
+    journal.append('update', '1', 'example.com', 'www', 'AAAA', 'default', '2408::b', '2408::c', 0.01, ts=30)
+    yield journal
+    journal.close()
+
+
+def test_values_at_returns_value_before_first_later_change(journal):
+    assert journal.values_at(15) == [
+        ('2', 'example.com', 'api', 'AAAA', 'default', None),
+        ('1', 'example.com', 'www', 'AAAA', 'default', '2408::a'),
+    ]
+
+
+def test_values_at_between_changes(journal):
+    assert journal.values_at(25) == [('1', 'example.com', 'www', 'AAAA', 'default', '2408::b')]
+
+
+def test_values_at_before_creation_is_none(journal):
+    assert journal.values_at(0)[1][5] is None
+
+
+def test_values_at_after_last_change_is_empty(journal):
+    assert journal.values_at(30) == []
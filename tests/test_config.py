@@ -0,0 +1,125 @@
+import logging
+
+import pytest
+
+from main import compile_domains, compile_profiles, compile_settings
+
+PROFILES = compile_profiles({
+    'default': {'access_key_id': 'ak', 'access_key_secret': 'secret'},
+    'other': {'access_key_id': 'ak2', 'access_key_secret': 'secret2', 'region': 'cn-shanghai'},
+})
+SETTINGS = compile_settings({})
+
+
+def block(**overrides):
+    block = {'domain_name': 'example.com', 'bind_interface': 'eth0', 'type': 'AAAA', 'subdomain': ['www', '@']}
+    block.update(overrides)
+    return block
+
+
+def test_compile_expands_records():
+    zone, = compile_domains([block(type=['A', 'AAAA'])], PROFILES, SETTINGS)
+    assert zone.types == ('A', 'AAAA')
+    assert zone.profile == 'default'
+    assert zone.region == 'cn-hangzhou'
+    assert zone.address_policy == 'stable'
+    assert [(type, [spec.fqdn for spec in specs]) for type, specs in zone.records] == [
+        ('A', ['www.example.com', 'example.com']),
+        ('AAAA', ['www.example.com', 'example.com']),
+    ]
+    assert zone.records[0][1][0].key == 'example.com/www/A/default'
+
+
+def test_region_defaults_to_profile_region():
+    zone, = compile_domains([block(profile='other')], PROFILES, SETTINGS)
+    assert zone.region == 'cn-shanghai'
+
+
+@pytest.mark.parametrize('overrides, message', [
+    ({'domain_name': None}, '缺少 domain_name'),
+    ({'bind_interface': 1}, 'bind_interface 类型错误'),
+    ({'type': 'MX'}, '不支持的记录类型'),
+    ({'type': []}, 'type 不能为空'),
+    ({'subdomain': []}, 'subdomain'),
+    ({'subdomain': ['www', '']}, 'subdomain'),
+    ({'profile': 'missing'}, '不存在的账号配置'),
+    ({'address_policy': 'newest'}, 'address_policy'),
+    ({'allow_private': 'yes'}, 'allow_private 类型错误'),
+])
+def test_invalid_block_rejected(overrides, message):
+    config = block(**overrides)
+    config = {key: value for key, value in config.items() if value is not None}
+    with pytest.raises(ValueError, match=message):
+        compile_domains([config], PROFILES, SETTINGS)
+
+
+def test_conflicting_routes_rejected():
+    with pytest.raises(ValueError, match='不同的账号或地域'):
+        compile_domains([block(), block(subdomain='api', profile='other')], PROFILES, SETTINGS)
+
+
+def test_duplicate_records_kept_once():
+    zones = compile_domains([block(), block(subdomain=['www', 'api'])], PROFILES, SETTINGS)
+    assert [spec.rr for spec in zones[0].records[0][1]] == ['www', '@']
+    assert [spec.rr for spec in zones[1].records[0][1]] == ['api']
+
+
+def test_fully_duplicate_block_has_no_records():
+    zones = compile_domains([block(), block()], PROFILES, SETTINGS)
+    assert zones[1].records == ()
+
+
+def test_duplicate_with_different_binding_warns(caplog):
+    with caplog.at_level(logging.WARNING, logger='DDNSLogger'):
+        zones = compile_domains([block(), block(subdomain='www', bind_interface='eth1')], PROFILES, SETTINGS)
+    assert zones[1].records == ()
+    assert 'www.example.com (AAAA) 在多个配置块中绑定了不同的接口或地址策略' in caplog.text
+
+
+def test_identical_duplicate_does_not_warn(caplog):
+    with caplog.at_level(logging.WARNING, logger='DDNSLogger'):
+        compile_domains([block(), block()], PROFILES, SETTINGS)
+    assert caplog.text == ''
+
+
+def test_settings_defaults():
+    settings = compile_settings({'state_file': '/var/lib/ddns/state.json'})
+    assert settings.journal_file == '/var/lib/ddns/journal.sqlite3'
+    assert settings.backend == 'sdk'
+    assert settings.max_workers == 8
+    assert settings.api_burst is None
+    assert compile_settings({}) == compile_settings({})
+
+
+@pytest.mark.parametrize('config, message', [
+    ({'state_ttl': '3600'}, 'state_ttl 类型错误'),
+    ({'max_workers': '8'}, 'max_workers 类型错误'),
+    ({'max_workers': 1.5}, 'max_workers 类型错误'),
+    ({'max_workers': 0}, 'max_workers 必须大于 0'),
+    ({'api_qps': True}, 'api_qps 类型错误'),
+    ({'reconcile_interval': -1}, 'reconcile_interval 必须不小于 0'),
+    ({'backend': 'asyncc'}, 'backend 必须是 sdk / async 之一'),
+    ({'address_source': 'ifconfig'}, 'address_source'),
+    ({'address_source': 'scripted'}, 'address_script'),
+    ({'min_interval': 600, 'max_interval': 300}, 'min_interval 不能大于 max_interval'),
+    ({'netlink_watch': 'yes'}, 'netlink_watch 类型错误'),
+])
+def test_invalid_settings_rejected(config, message):
+    with pytest.raises(ValueError, match=message):
+        compile_settings(config)
+
+
+def test_settings_must_be_a_table():
+    with pytest.raises(ValueError, match='格式错误'):
+        compile_settings([])
+
+
+def test_unknown_setting_warns(caplog):
+    with caplog.at_level(logging.WARNING, logger='DDNSLogger'):
+        compile_settings({'max_worker': 4})
+    assert 'max_worker' in caplog.text
+
+
+def test_default_address_policy_from_settings():
+    zone, = compile_domains([block()], PROFILES, compile_settings({'address_policy': 'temporary'}))
+    assert zone.address_policy == 'temporary'
@@ -0,0 +1,172 @@
+import atexit
+import gzip
+import logging
+import logging.handlers
+import os
+import socket
+import struct
+
+import pytest
+
+import log_handlers
+from log_handlers import GzipTimedRotatingFileHandler, JournalHandler, RepeatedLogFilter, log_fields, setup_logger
+
+
+def parse_datagram(data: bytes) -> dict:
+    """按 journald 原生协议解析一个数据报"""
+    fields = {}
+    while data:
+        head, _, rest = data.partition(b'\n')
+        if b'=' in head:
+            name, _, value = head.partition(b'=')
+            fields[name.decode()] = value.decode()
+            data = rest
+        else:
+            length = struct.unpack('<Q', rest[:8])[0]
+            assert rest[8 + length:9 + length] == b'\n'
+            fields[head.decode()] = rest[8:8 + length].decode()
+            data = rest[9 + length:]
+    return fields
+
+
+@pytest.fixture
+def journal(tmp_path):
+    path = str(tmp_path / 'journal.sock')
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    server.bind(path)
+    server.settimeout(5)
+    handler = JournalHandler(path)
+    logger = logging.getLogger('test_journal')
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+    yield logger, server
+    logger.removeHandler(handler)
+    handler.close()
+    server.close()
+
+
+def test_encode_field_single_line():
+    assert JournalHandler.encode_field('RR', 'www') == b'RR=www\n'
+
+
+def test_encode_field_multi_line():
+    value = '第一行\n第二行'.encode('utf-8')
+    assert JournalHandler.encode_field('MESSAGE', '第一行\n第二行') == \
+        b'MESSAGE\n' + struct.pack('<Q', len(value)) + value + b'\n'
+
+
+def test_emit_sends_structured_fields(journal):
+    logger, server = journal
+    logger.info('成功更新DNS记录: www.example.com -> 2408:8000::1',
+                extra=log_fields('UpdateDomainRecord', 'example.com', 'www', '12345', 0.0421))
+    fields = parse_datagram(server.recv(65536))
+    assert fields['MESSAGE'] == '成功更新DNS记录: www.example.com -> 2408:8000::1'
+    assert fields['PRIORITY'] == '6'
+    assert fields['SYSLOG_IDENTIFIER'] == 'alicloud-ddns'
+    assert fields['DOMAIN'] == 'example.com'
+    assert fields['RR'] == 'www'
+    assert fields['RECORD_ID'] == '12345'
+    assert fields['ACTION'] == 'UpdateDomainRecord'
+    assert fields['LATENCY_MS'] == '42'
+
+
+def test_emit_frames_multi_line_message(journal):
+    logger, server = journal
+    try:
+        raise RuntimeError('boom')
+    except RuntimeError:
+        logger.error('更新失败', exc_info=True)
+    fields = parse_datagram(server.recv(65536))
+    assert fields['MESSAGE'].startswith('更新失败\nTraceback')
+    assert fields['MESSAGE'].endswith('RuntimeError: boom')
+    assert fields['PRIORITY'] == '3'
+    assert 'DOMAIN' not in fields
+
+
+def write_and_rotate(handler: GzipTimedRotatingFileHandler, message: str, day: int) -> None:
+    """写入一条日志后按第 day 天的零点轮转, 每次轮转得到不同日期的文件名"""
+    handler.emit(logging.makeLogRecord({'msg': message}))
+    handler.rolloverAt = 1700000000 + 86400 * day
+    handler.doRollover()
+
+
+def test_rotation_compresses_and_keeps_retention(tmp_path):
+    handler = GzipTimedRotatingFileHandler(str(tmp_path / 'ddns.log'), retention=2)
+    for day in range(4):
+        write_and_rotate(handler, f'day {day}', day)
+    handler.close()
+    rotated = sorted(name for name in os.listdir(tmp_path) if name.endswith('.gz'))
+    assert len(rotated) == 2
+    assert [gzip.open(tmp_path / name).read() for name in rotated] == [b'day 2\n', b'day 3\n']
+
+
+def test_rotation_survives_deleted_log_file(tmp_path):
+    # 回归: 日志文件被外部删除后, 轮转抛出异常且不再前进, 之后的日志全部丢失
+    path = tmp_path / 'ddns.log'
+    handler = GzipTimedRotatingFileHandler(str(path))
+    handler.emit(logging.makeLogRecord({'msg': 'before'}))
+    path.unlink()
+    handler.rolloverAt = 0
+    handler.emit(logging.makeLogRecord({'msg': 'after'}))
+    handler.close()
+    assert handler.rolloverAt > 0
+    assert path.read_text() == 'after\n'
+
+
+def test_setup_logger_closes_previous_handlers(tmp_path, monkeypatch):
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    server.bind(str(tmp_path / 'journal.sock'))
+    monkeypatch.setattr(log_handlers, 'JOURNAL_SOCKET', str(tmp_path / 'journal.sock'))
+    logger = setup_logger(True)
+    try:
+        first, = [handler for handler in logger.handlers if isinstance(handler, logging.handlers.QueueHandler)]
+        journal_handler, = first.listener.handlers
+        setup_logger(True)
+        assert journal_handler.sock.fileno() == -1
+        assert first not in logger.handlers
+    finally:
+        for handler in list(logger.handlers):
+            if isinstance(handler, logging.handlers.QueueHandler):
+                atexit.unregister(handler.listener.stop)
+                handler.listener.stop()
+                for listener_handler in handler.listener.handlers:
+                    listener_handler.close()
+                logger.removeHandler(handler)
+        server.close()
+
+
+def warning(msg: str, lineno: int = 1, level: int = logging.WARNING, **extra) -> logging.LogRecord:
+    return logging.makeLogRecord({'msg': msg, 'levelno': level, 'pathname': 'main.py', 'lineno': lineno, **extra})
+
+
+def test_repeated_warnings_suppressed_within_window():
+    clock = [0.0]
+    log_filter = RepeatedLogFilter(60, lambda: clock[0])
+    assert log_filter.filter(warning('更新失败: boom RequestId: 1A2B'))
+    clock[0] = 30
+    assert not log_filter.filter(warning('更新失败: boom RequestId: 3C4D'))
+    assert not log_filter.filter(warning('更新失败: boom RequestId: 5E6F'))
+    # 其他位置或内容不同的日志不受影响
+    assert log_filter.filter(warning('更新失败: boom', lineno=2))
+    assert log_filter.filter(warning('更新失败: other'))
+    clock[0] = 61
+    record = warning('更新失败: boom RequestId: 7A8B')
+    assert log_filter.filter(record)
+    assert record.getMessage() == '更新失败: boom RequestId: 7A8B (此前 60 秒内已抑制 2 条相同日志)'
+
+
+def test_info_and_disabled_window_never_suppressed():
+    log_filter = RepeatedLogFilter(60, lambda: 0.0)
+    assert all(log_filter.filter(warning('检查完成', level=logging.INFO)) for _ in range(3))
+    disabled = RepeatedLogFilter(0, lambda: 0.0)
+    assert all(disabled.filter(warning('更新失败')) for _ in range(3))
+
+
+def test_repeat_key_collapses_varying_messages():
+    log_filter = RepeatedLogFilter(60, lambda: 0.0)
+    key = ('UpdateDomainRecord', 'Throttling.User')
+    assert log_filter.filter(warning('调用失败, 0.7 秒后重试 (第 1 次失败)', repeat_key=key))
+    assert not log_filter.filter(warning('调用失败, 1.9 秒后重试 (第 2 次失败)', repeat_key=key))
+    other = ('UpdateDomainRecord', 'InternalError')
+    assert log_filter.filter(warning('调用失败, 1.1 秒后重试 (第 1 次失败)', repeat_key=other))
@@ -0,0 +1,62 @@
+import json
+import sys
+
+import pytest
+
+import main
+from main import EXIT_CHANGED, EXIT_ERROR, EXIT_UNCHANGED
+
+
+@pytest.fixture
+def run_once(mock, tmp_path, monkeypatch):
+    """用模拟服务和脚本地址来源运行 main.py --once, 返回退出码"""
+    monkeypatch.setattr(main, 'setup_logger', lambda *args, **kwargs: main.logging.getLogger('DDNSLogger'))
+
+    def run(secret='secret', interface='eth0', extra=''):
+        script = tmp_path / 'timeline.json'
+        script.write_text(json.dumps({'events': [{'at': 0, 'interface': 'eth0', 'addresses': ['2408:8000::1']}]}))
+        config = tmp_path / 'config.toml'
+        config.write_text(f"""
+[credentials]
+access_key_id = "test"
+access_key_secret = "{secret}"
+
+[settings]
+endpoint = "{mock.endpoint}"
+api_protocol = "http"
+api_max_attempts = 1
+state_file = "{tmp_path / 'state.json'}"
+address_source = "scripted"
+address_script = "{script}"
+{extra}
+
+[[domains]]
+domain_name = "example.com"
+bind_interface = "{interface}"
+type = "AAAA"
+subdomain = ["www", "api"]
+""")
+        monkeypatch.setattr(sys, 'argv', ['main.py', '--config', str(config), '--once'])
+        return main.main()
+
+    return run
+
+
+def test_once_exit_codes(run_once, mock):
+    assert run_once() == EXIT_CHANGED
+    assert len(mock.state.records) == 2
+    assert run_once() == EXIT_UNCHANGED
+
+
+def test_once_fails_on_api_error(run_once):
+    assert run_once(secret='wrong') == EXIT_ERROR
+
+
+def test_once_fails_when_interface_missing(run_once, mock):
+    assert run_once(interface='eth9') == EXIT_ERROR
+    assert mock.state.calls == []
+
+
+def test_once_fails_on_invalid_config(run_once, mock):
+    assert run_once(extra='max_workers = "8"') == EXIT_ERROR
+    assert mock.state.calls == []
@@ -0,0 +1,80 @@
+import time
+
+import pytest
+
+import main
+from alidns_rpc import AlidnsError
+from main import RateLimiter, RetryPolicy
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(main.time, 'monotonic', clock)
+    return clock
+
+
+def test_rate_limiter_allows_burst_then_queues(clock):
+    limiter = RateLimiter(qps=2, burst=2)
+    assert [limiter.reserve() for _ in range(4)] == [0.0, 0.0, 0.5, 1.0]
+
+
+def test_rate_limiter_refills_over_time(clock):
+    limiter = RateLimiter(qps=2, burst=2)
+    for _ in range(2):
+        limiter.reserve()
+    clock.now += 10
+    # 令牌最多积累 burst 个
+    assert [limiter.reserve() for _ in range(3)] == [0.0, 0.0, 0.5]
+
+
+def test_rate_limiter_drain_discards_saved_tokens(clock):
+    limiter = RateLimiter(qps=4, burst=4)
+    limiter.drain()
+    assert limiter.reserve() == 0.25
+
+
+def test_rate_limiter_disabled():
+    limiter = RateLimiter(qps=0)
+    assert all(limiter.reserve() == 0.0 for _ in range(100))
+
+
+def test_retry_only_transient_errors():
+    policy = RetryPolicy(max_attempts=5)
+    deadline = time.monotonic() + 3600
+    assert policy.backoff(1, 0, AlidnsError('Throttling.User', 'slow down', 400), deadline) is not None
+    assert policy.backoff(1, 0, AlidnsError('InternalError', 'oops', 500), deadline) is not None
+    assert policy.backoff(1, 0, ConnectionError(), deadline) is not None
+    assert policy.backoff(1, 0, AlidnsError('InvalidAccessKeyId.NotFound', 'bad key', 404), deadline) is None
+    assert policy.backoff(1, 0, ValueError(), deadline) is None
+
+
+def test_retry_stops_after_max_attempts():
+    policy = RetryPolicy(max_attempts=3)
+    deadline = time.monotonic() + 3600
+    error = ConnectionError()
+    assert policy.backoff(2, 0, error, deadline) is not None
+    assert policy.backoff(3, 0, error, deadline) is None
+
+
+def test_retry_delay_bounds():
+    policy = RetryPolicy(max_attempts=100, base_delay=0.5, max_delay=4)
+    deadline = time.monotonic() + 3600
+    previous = 0.0
+    for attempt in range(1, 50):
+        delay = policy.backoff(attempt, previous, ConnectionError(), deadline)
+        assert 0.5 <= delay <= min(4, max(previous, 0.5) * 3)
+        previous = delay
+
+
+def test_retry_respects_deadline():
+    policy = RetryPolicy(base_delay=0.5)
+    assert policy.backoff(1, 0, ConnectionError(), time.monotonic() + 0.1) is None
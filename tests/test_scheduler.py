@@ -0,0 +1,49 @@
+from main import AdaptiveScheduler, SyncReport
+
+
+def scheduler(job=None) -> AdaptiveScheduler:
+    return AdaptiveScheduler(job, interval=300, min_interval=60, max_interval=900, retry_interval=15)
+
+
+def test_change_shortens_then_stable_doubles_to_max():
+    s = scheduler()
+    assert s.next_delay(SyncReport(updated=1)) == 60
+    assert [s.next_delay(SyncReport(unchanged=2)) for _ in range(5)] == [120, 240, 480, 900, 900]
+    assert s.next_delay(SyncReport(created=1)) == 60
+
+
+def test_failures_back_off_with_jitter():
+    s = scheduler()
+    for failures, backoff in enumerate([15, 30, 60, 120, 240, 480, 900, 900], 1):
+        delay = s.next_delay(SyncReport(failed=1) if failures % 2 else None)
+        assert backoff / 2 <= delay <= backoff
+        assert s.failures == failures
+
+
+def test_success_resets_backoff():
+    s = scheduler()
+    s.next_delay(None)
+    s.next_delay(None)
+    s.next_delay(SyncReport(unchanged=1))
+    assert s.failures == 0
+    assert s.next_delay(None) <= 15
+
+
+def test_interval_bounds_include_initial_interval():
+    s = AdaptiveScheduler(None, interval=30, min_interval=60, max_interval=20)
+    assert (s.min_interval, s.max_interval) == (30, 30)
+
+
+def test_run_once_skips_while_previous_sync_running():
+    s = scheduler(lambda blocking: None)
+    assert s.run_once() == 300
+    assert s.failures == 0
+
+
+def test_run_once_counts_exceptions_as_failures():
+    def job(blocking):
+        raise RuntimeError('boom')
+
+    s = scheduler(job)
+    assert 7.5 <= s.run_once() <= 15
+    assert s.failures == 1
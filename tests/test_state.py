@@ -0,0 +1,55 @@
+import json
+import logging
+
+from main import StateCache
+
+
+def test_fresh_until_ttl_expires(tmp_path):
+    cache = StateCache(str(tmp_path / 'state.json'), ttl=60)
+    key = StateCache.key('example.com', 'www', 'AAAA')
+    assert key == 'example.com/www/AAAA/default'
+    assert not cache.is_fresh(key, '2408::1', 1000)
+    cache.confirm(key, '2408::1', '100000', 1000)
+    assert cache.is_fresh(key, '2408::1', 1059)
+    assert not cache.is_fresh(key, '2408::2', 1059)
+    assert not cache.is_fresh(key, '2408::1', 1060)
+
+
+def test_invalidate(tmp_path):
+    cache = StateCache(str(tmp_path / 'state.json'), ttl=60)
+    cache.confirm('k', '2408::1', '1', 0)
+    cache.invalidate('k')
+    assert not cache.is_fresh('k', '2408::1', 0)
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = tmp_path / 'state' / 'state.json'
+    cache = StateCache(str(path), ttl=60)
+    cache.confirm('k', '2408::1', '1', 1000)
+    cache.mark_reconciled(900)
+    cache.save()
+    assert not cache.dirty
+    assert not (tmp_path / 'state' / 'state.json.tmp').exists()
+
+    loaded = StateCache(str(path), ttl=60)
+    assert loaded.last_reconcile == 900
+    assert loaded.is_fresh('k', '2408::1', 1000)
+
+
+def test_save_skipped_when_clean(tmp_path):
+    path = tmp_path / 'state.json'
+    StateCache(str(path), ttl=60).save()
+    assert not path.exists()
+
+
+def test_corrupt_file_starts_empty(tmp_path, caplog):
+    path = tmp_path / 'state.json'
+    path.write_text('{not json')
+    with caplog.at_level(logging.WARNING, logger='DDNSLogger'):
+        cache = StateCache(str(path), ttl=60)
+    assert cache.records == {}
+    assert cache.last_reconcile == 0.0
+    assert '读取状态缓存失败' in caplog.text
+    cache.confirm('k', '2408::1', '1', 0)
+    cache.save()
+    assert json.loads(path.read_text())['records']['k']['value'] == '2408::1'
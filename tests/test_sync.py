@@ -0,0 +1,241 @@
+import logging
+import random
+import time
+
+import pytest
+
+from alidns_rpc import AlidnsError
+
+from addresses import ScriptedAddressProvider
+from log_handlers import RepeatedLogFilter
+from main import (AliyunDDNS, AsyncAliyunDDNS, RecordTarget, compile_domains, compile_profiles, compile_settings,
+                  format_plan)
+
+DOMAIN = 'example.com'
+INTERFACE = 'eth0'
+ADDRESSES = ('2408:8000::1', '2408:8000::2')
+BACKENDS = {'sdk': AliyunDDNS, 'async': AsyncAliyunDDNS}
+
+
+@pytest.fixture
+def make_ddns(mock, tmp_path):
+    """按后端名创建连接到模拟服务的客户端, 接口地址由 phase[0] 选择 ADDRESSES 中的一个"""
+    created = []
+
+    def make(backend='sdk', subdomains=('www', 'api'), domain=DOMAIN, **settings):
+        settings = compile_settings({
+            'endpoint': mock.endpoint,
+            'api_protocol': 'http',
+            'state_file': str(tmp_path / 'state.json'),
+            'journal_file': str(tmp_path / 'journal.sqlite3'),
+            **settings,
+        })
+        profiles = compile_profiles({'default': {'access_key_id': 'test', 'access_key_secret': 'secret'}})
+        domains = compile_domains([{'domain_name': domain, 'bind_interface': INTERFACE, 'type': 'AAAA',
+                                    'subdomain': list(subdomains)}], profiles, settings)
+        ddns = BACKENDS[backend](profiles, domains, settings)
+        phase = [0]
+        ddns.address_provider = ScriptedAddressProvider(
+            [(index, INTERFACE, [address]) for index, address in enumerate(ADDRESSES)], lambda: phase[0])
+        created.append(ddns)
+        return ddns, phase
+
+    yield make
+    for ddns in created:
+        ddns.close()
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_concurrency_above_max_workers(mock, make_ddns, backend):
+    # 回归: Python 3.10 之前在事件循环外创建的 Semaphore 在并发数超过 max_workers 时报错
+    mock.state.latency = 0.01
+    ddns, _ = make_ddns(backend, [f'host{i}' for i in range(12)], max_workers=2)
+    report = ddns.sync()
+    assert (report.created, report.failed) == (12, 0)
+
+
+def test_rollback_skips_domains_no_longer_configured(make_ddns):
+    ddns, phase = make_ddns()
+    ddns.sync()
+    before_change = time.time()
+    phase[0] = 1
+    ddns.sync()
+
+    # 配置中的域名改名后, 变更日志中的旧域名无法确定所属账号
+    renamed, _ = make_ddns(domain='example.org')
+    plan, report = renamed.rollback(before_change)
+    assert plan == []
+    assert report.failed == 2
+
+
+def test_retry_warnings_collapsed_by_error_code(make_ddns):
+    ddns, _ = make_ddns()
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    handler.addFilter(RepeatedLogFilter(60))
+    ddns.logger.addHandler(handler)
+    try:
+        limiter = ddns.rate_limiters['default']
+        for attempt in range(1, 4):
+            ddns.retry_delay('UpdateDomainRecord', attempt, 0.5, AlidnsError('Throttling.User', 'busy', 400), limiter)
+        ddns.retry_delay('UpdateDomainRecord', 1, 0.5, AlidnsError('InternalError', 'oops', 500), limiter)
+    finally:
+        ddns.logger.removeHandler(handler)
+    assert [record.getMessage().split(': ', 1)[1] for record in records] == ['Throttling.User: busy',
+                                                                          'InternalError: oops']
+
+
+def test_fresh_cache_skips_api_calls(mock, make_ddns):
+    ddns, _ = make_ddns()
+    ddns.sync()
+    start = len(mock.state.calls)
+    report = ddns.sync()
+    assert (report.checked, report.unchanged, report.failed) == (2, 2, 0)
+    assert mock.state.calls[start:] == []
+
+    # 缓存写入磁盘, 重启后仍然有效
+    restarted, _ = make_ddns()
+    assert restarted.sync().unchanged == 2
+    assert mock.state.calls[start:] == []
+
+
+def test_expired_cache_and_reconcile_read_the_zone(mock, make_ddns):
+    clock = [100000.0]
+    ddns, _ = make_ddns(state_ttl=60, reconcile_interval=3600)
+    ddns.clock = lambda: clock[0]
+    ddns.sync()
+
+    # 缓存过期后重新读取快照确认, 值未变化时不写入
+    clock[0] += 61
+    start = len(mock.state.calls)
+    report = ddns.sync()
+    assert mock.state.calls[start:] == ['DescribeDomainRecords']
+    assert (report.unchanged, report.updated) == (2, 0)
+
+    # 云端记录被手工修改, 缓存有效期内不会发现
+    mock.state.records[0]['Value'] = '2408:8000::dead'
+    clock[0] += 30
+    assert ddns.sync().updated == 0
+
+    # 全量对账忽略缓存, 修正被改动的记录
+    clock[0] += 3600
+    report = ddns.sync()
+    assert (report.updated, report.unchanged) == (1, 1)
+    assert mock.state.records[0]['Value'] == '2408:8000::1'
+    assert ddns.state.last_reconcile == clock[0]
+
+
+def test_plan_diffs_against_the_zone_without_writing(mock, make_ddns):
+    mock.state.add_record(DOMAIN, 'www', 'AAAA', '2408:8000::old')
+    mock.state.add_record(DOMAIN, 'mail', 'AAAA', ADDRESSES[0])
+    # 其他类型和线路的同名记录不参与比较
+    mock.state.add_record(DOMAIN, 'api', 'A', '203.0.113.1')
+    mock.state.add_record(DOMAIN, 'api', 'AAAA', '2408:8000::old', line='telecom')
+    ddns, _ = make_ddns(subdomains=('mail', 'api', 'www'))
+    start = len(mock.state.calls)
+    plan = ddns.plan()
+    assert mock.state.calls[start:] == ['DescribeDomainRecords']
+    assert [(item.action, item.target.rr) for item in plan] == [('update', 'www'), ('create', 'api'),
+                                                                ('noop', 'mail')]
+    assert format_plan(plan, ddns.zone_pages).splitlines() == [
+        '~ www.example.com AAAA default (100000): 2408:8000::old -> 2408:8000::1',
+        '+ api.example.com AAAA default -> 2408:8000::1',
+        '= mail.example.com AAAA default -> 2408:8000::1',
+        '计划: 创建 1, 更新 1, 无变化 1, 跳过 0; 预计 API 调用: 读取 1, 写入 2',
+    ]
+
+
+def test_plan_groups_by_domain_and_skips_unreadable_zones(make_ddns):
+    ddns, _ = make_ddns()
+    ddns.load_zones = lambda domains: None
+    ddns.zones = {
+        'a.com': {('www', 'AAAA', 'default'): {'RecordId': '1', 'Value': '2408::0'}},
+        'b.com': {('www', 'AAAA', 'default'): {'RecordId': '2', 'Value': '2408::1'}},
+    }
+
+    def target(domain, rr):
+        return RecordTarget(domain, rr, 'AAAA', 'default', '2408::1', f'{domain}/{rr}', f'{rr}.{domain}')
+
+    plan = ddns.build_plan([target('b.com', 'www'), target('c.com', 'www'), target('b.com', 'api'),
+                            target('a.com', 'api'), target('a.com', 'www')])
+    assert [(item.action, item.target.fqdn) for item in plan] == [
+        ('update', 'www.a.com'), ('create', 'api.a.com'),
+        ('create', 'api.b.com'), ('noop', 'www.b.com'),
+        ('skip', 'www.c.com'),
+    ]
+    assert format_plan(plan[-1:], {}).splitlines()[0] == '! www.c.com AAAA default: 域名快照获取失败, 跳过'
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_sync_creates_skips_then_updates(mock, make_ddns, backend):
+    ddns, phase = make_ddns(backend)
+    report = ddns.sync()
+    assert (report.checked, report.created, report.failed) == (2, 2, 0)
+    assert sorted(mock.state.calls) == ['AddDomainRecord', 'AddDomainRecord', 'DescribeDomainRecords']
+
+    start = len(mock.state.calls)
+    assert ddns.sync().unchanged == 2
+    assert mock.state.calls[start:] == []
+
+    phase[0] = 1
+    report = ddns.sync()
+    assert (report.updated, report.failed) == (2, 0)
+    assert sorted(mock.state.calls[start:]) == ['DescribeDomainRecords', 'UpdateDomainRecord', 'UpdateDomainRecord']
+    assert {(record['RR'], record['Value']) for record in mock.state.records} == {('www', ADDRESSES[1]),
+                                                                                  ('api', ADDRESSES[1])}
+    assert [row[5] for row in ddns.journal.values_at(0)] == [None, None]
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_sync_retries_through_throttling_and_server_errors(mock, make_ddns, backend):
+    mock.state.qps = 5
+    mock.state.error_rate = 0.2
+    mock.state.random = random.Random(1)
+    ddns, _ = make_ddns(backend, [f'host{i}' for i in range(8)], api_qps=0, api_max_attempts=20,
+                        retry_base_delay=0.05, retry_max_delay=0.3)
+    report = ddns.sync()
+    assert (report.created, report.failed) == (8, 0)
+    assert mock.state.throttled > 0
+    assert ddns.api_retries.get('AddDomainRecord') + ddns.api_retries.get('DescribeDomainRecords') > 0
+
+
+def compile_config(blocks, secret='secret'):
+    profiles = compile_profiles({'default': {'access_key_id': 'test', 'access_key_secret': secret}})
+    return profiles, compile_domains(blocks, profiles, compile_settings({}))
+
+
+def zone_block(interface=INTERFACE, domain=DOMAIN, subdomains=('www', 'api')):
+    return {'domain_name': domain, 'bind_interface': interface, 'type': 'AAAA', 'subdomain': list(subdomains)}
+
+
+def test_reload_detects_added_edited_and_removed_blocks(make_ddns, caplog):
+    ddns, _ = make_ddns()
+    caplog.set_level(logging.INFO, logger='DDNSLogger')
+
+    assert ddns.reload(*compile_config([zone_block()])) == set()
+    assert '新增或修改 0 个域名配置块, 移除 0 个' in caplog.text
+
+    assert ddns.reload(*compile_config([zone_block(), zone_block('eth1', 'example.org')])) == {'eth1'}
+    assert ddns.routes['example.org'] == ('default', 'cn-hangzhou')
+
+    caplog.clear()
+    assert ddns.reload(*compile_config([zone_block(subdomains=('www',)), zone_block('eth1', 'example.org')])) \
+        == {INTERFACE}
+    assert '新增或修改 1 个域名配置块, 移除 0 个' in caplog.text
+
+    caplog.clear()
+    assert ddns.reload(*compile_config([zone_block(subdomains=('www',))])) == set()
+    assert '新增或修改 0 个域名配置块, 移除 1 个' in caplog.text
+    assert 'example.org' not in ddns.routes
+
+
+def test_reload_recreates_clients_for_changed_credentials(make_ddns):
+    ddns, _ = make_ddns()
+    ddns.sync()
+    client = ddns.clients.get('default', 'cn-hangzhou')
+    limiter = ddns.rate_limiters['default']
+
+    assert ddns.reload(*compile_config([zone_block()], secret='rotated')) == {INTERFACE}
+    assert ddns.rate_limiters['default'] is not limiter
+    assert ddns.clients.get('default', 'cn-hangzhou') is not client